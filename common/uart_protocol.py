@@ -3,6 +3,9 @@ import time
 import uasyncio as asyncio  # Import uasyncio for async operations
 # This file contains the UART commands
 
+# Set True to trace every command sent and received on the REPL
+_DEBUG = False
+
 class UARTChecksumError(Exception):
     pass
 
@@ -89,10 +92,16 @@ class uartActions():
     brightness = 7
     hybernate = 8
 
+_CMDLEN = 5  # Length of the command string
+_MAX_DIGIT = hourMinutesDigit.conductor
+
+_DIGIT_VALUE = (0x3F,0x06,0x5B,0x4F,0x66,0x6D,0x7D,0x07,0x7F,0x67,0x63,0x5C,0x39,0x71,0x40,0x00)
+_DIGIT_TEST = (0x21,0x03,0x60,0x42,0x41,0x22,0x70,0x43,0x61,0x62,0x25,0x0D,0x49,0x46,0x45,0x00)
+
 class uartCommand():
     """
     A class to represent a UART command.
-    The UART protocol is a 3 character string
+    The UART protocol is a 5 character string: digit, action and a 3 digit value
     The valid character set is 0-15 for the digit display
         0 = 	0011 1111   0x3F
         1 =	0000 0110   0x06
@@ -132,12 +141,12 @@ class uartCommand():
 
     Attributes:
     -----------
-    cmdStr : str
-        The command string for the UART command.
-    digitValue : list
-        A list of hexadecimal values representing digit values.
-    digitTest : list
-        A list of hexadecimal values representing test digit values.
+    cmdStr : str or bytes
+        The command string for the UART command, as passed in (received commands are bytes).
+    digitValue : tuple
+        A shared tuple of hexadecimal values representing digit values.
+    digitTest : tuple
+        A shared tuple of hexadecimal values representing test digit values.
     digit : int
         The digit part of the UART command string.
     action : int
@@ -151,40 +160,74 @@ class uartCommand():
         Class method that returns the length of the command string.
     encode():
         Encodes the UART command string into a bytearray.
+    encode_into(buf):
+        Encodes the UART command into buf and returns the number of bytes written.
     set(uartCmdString):
         Sets the digit, action, and value attributes based on the UART command string.
+        Raises UARTChecksumError if the string is not commandlen() characters long.
     """
     @classmethod
     def commandlen(cls):
-        return 5  # Define the length of the command string
-    
-    @property
-    def cmdStr(self):
-        return str(self._cmdStr)
-
-    @cmdStr.setter
-    def cmdStr(self, value: str):
-        self._cmdStr = value
+        return _CMDLEN
     
-    @property
-    def digitValue(self):
-        return [0x3F,0x06,0x5B,0x4F,0x66,0x6D,0x7D,0x07,0x7F,0x67,0x63,0x5C,0x39,0x71,0x40,0x00]
-
-    @property
-    def digitTest(self):
-        return [0x21,0x03,0x60,0x42,0x41,0x22,0x70,0x43,0x61,0x62,0x25,0x0D,0x49,0x46,0x45,0x00]
+    digitValue = _DIGIT_VALUE
+    digitTest = _DIGIT_TEST
 
-    def __init__(self, uartCmdString: str):
+    def __init__(self, uartCmdString):
         self.cmdStr = uartCmdString
         self.set(uartCmdString)
 
     def encode(self):
-        return bytearray('{0}{1}{2:02}'.format(self.digit, self.action, self.value), 'utf-8')
+        return bytearray(b'%d%d%03d' % (self.digit, self.action, self.value))
+
+    def encode_into(self, buf):
+        d = self.digit
+        a = self.action
+        v = self.value
+        if 0 <= d <= 9 and 0 <= a <= 9 and 0 <= v <= 999:
+            buf[0] = 0x30 + d
+            buf[1] = 0x30 + a
+            buf[2] = 0x30 + v // 100
+            buf[3] = 0x30 + v // 10 % 10
+            buf[4] = 0x30 + v % 10
+            return _CMDLEN
+        b = self.encode()
+        n = len(b)
+        if n > len(buf):
+            raise ValueError("Encoded uartCommand too long = {0}".format(n))
+        buf[:n] = b
+        return n
     
     def set(self,uartCmdString):
-        self.digit = int(uartCmdString[0])
-        self.action = int(uartCmdString[1])
-        self.value = int(uartCmdString[2:])
+        # Commands are ASCII digits, so decode the bytes directly rather than via int()
+        s = uartCmdString
+        if isinstance(s, str):
+            s = s.encode()
+        n = len(s)
+        if n != _CMDLEN:
+            raise UARTChecksumError("Invalid uartCommand length = {0}".format(n))
+        digit = s[0] - 48
+        action = s[1] - 48
+        if not (0 <= digit <= 9 and 0 <= action <= 9):
+            raise ValueError("Invalid uartCommand string = {0}".format(s))
+        value = 0
+        for i in range(2, n):
+            c = s[i] - 48
+            if not 0 <= c <= 9:
+                raise ValueError("Invalid uartCommand string = {0}".format(s))
+            value = value * 10 + c
+        self.digit = digit
+        self.action = action
+        self.value = value
+
+# Command-sized buffers shared by every uartProtocol instance
+_BUF_POOL = []
+
+def _acquire():
+    return _BUF_POOL.pop() if _BUF_POOL else bytearray(_CMDLEN)
+
+def _release(b):
+    _BUF_POOL.append(b)
 
 class uartProtocol():
     """
@@ -207,8 +250,8 @@ class uartProtocol():
         Clears the UART receive buffer if there is any data available.
     async sendCommand(uartCmd):
         Sends a command over UART after encoding it to bytes.
-    async receiveCommand():
-        Receives a command from UART, validates it, and returns a uartCommand instance if valid.
+    async receiveCommand(timeout):
+        Waits up to timeout seconds for a command from UART, validates it, and returns a uartCommand instance if valid.
     """
     def __init__(self, uartCh, baudRate):
         self.uartCh = uartCh
@@ -221,40 +264,59 @@ class uartProtocol():
             self.uart = UART(1)
             self.uart.init(uartCh, baudRate, rx=Pin(uartPins.uartRx1Pin), tx=Pin(uartPins.uartTx1Pin), txbuf=4, rxbuf=4)
 
+        # Receive buffer reused across calls to avoid heap churn on every receive
+        self._rxbuf = bytearray(_CMDLEN)
+        self._zero = bytes(_CMDLEN)
+        self._rxmv = memoryview(self._rxbuf)
+        self._sreader = asyncio.StreamReader(self.uart)
+
     async def clearQueue(self):
         if self.uart.any() > 0:
             a = self.uart.readline()
-            print("clearQueue: {0}".format(a))
+            if _DEBUG:
+                print("clearQueue: {0}".format(a))
 
     async def sendCommand(self, uartCmd):
-        b = uartCmd.encode()
-        print("sendCommand: {0}".format(b))
-        self.uart.write(b)
+        b = _acquire()
+        try:
+            n = uartCmd.encode_into(b)
+            if _DEBUG:
+                print("sendCommand: {0}".format(b[:n]))
+            self.uart.write(memoryview(b)[:n])
+        finally:
+            _release(b)
         await asyncio.sleep(0)  # Yield control to the event loop
 
-    async def receiveCommand(self):
-        for i in range(20):
-            await asyncio.sleep(0.1)  # Non-blocking sleep
-            if self.uart.any() > 0:
-                uart_cmd_instance = uartCommand("00000")  # Create an instance with a default command string
-                b = bytearray(uart_cmd_instance.cmdStr, 'utf-8')  # Ensure correct length
-                self.uart.readinto(b)
-                if b == bytearray(b'\x00000'):
-                    return None
-                try:
-                    s = b.decode('utf-8')
-                    print("receiveCommand: {0}".format(s))
-                    uartCmd = uartCommand(s)  # Ensure uartCommand is initialized with a string
-                    helper = commandHelper()
-                    if helper.validate(uartCmd):
-                        return uartCmd
-                except ValueError:
-                    print("receiveCommand: ValueError")
-                except Exception as e:
-                    print("receiveCommand error: {0}".format(e))
-                return None
+    async def _readexactly_into(self, mv):
+        n = 0
+        while n < len(mv):
+            n += await self._sreader.readinto(mv[n:])
+
+    async def receiveCommand(self, timeout=2.0):
+        try:
+            # The stream is registered with the scheduler's poller, so this
+            # wakes as soon as bytes arrive instead of sleeping in fixed steps
+            await asyncio.wait_for(self._readexactly_into(self._rxmv), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if self._rxbuf == self._zero:
+            return None
+        try:
+            b = bytes(self._rxbuf)  # The command keeps its own copy; _rxbuf is reused
+            if _DEBUG:
+                print("receiveCommand: {0}".format(b))
+            uartCmd = uartCommand(b)
+            if commandHelper.validate(uartCmd):
+                return uartCmd
+        except ValueError:
+            print("receiveCommand: ValueError")
+        except Exception as e:
+            print("receiveCommand error: {0}".format(e))
         return None
 
+_HEX = "0123456789ABCDEF"
+_HEX_VALUE = {c: i for i, c in enumerate(_HEX)}
+
 class commandHelper():
     """
     A helper class for UART command operations including encoding, decoding, and validation.
@@ -274,33 +336,24 @@ class commandHelper():
     baudRate = [9600, 19200, 38400, 57600, 115200]
     
     def decodeHex(self, value):
-        returnVal = value
-        if value == "A":
-            returnVal = 10
-        elif value == "B":
-            returnVal = 11
-        elif value == "C":
-            returnVal = 12
-        elif value == "D":
-            returnVal = 13
-        elif value == "E":
-            returnVal = 14
-        elif value == "F":
-            returnVal = 15
-        return int(returnVal)
+        # Single hex characters come from the table; anything else (ints,
+        # multi-digit strings) goes through int(), which raises ValueError
+        v = _HEX_VALUE.get(value)
+        if v is None:
+            v = int(value)
+        return v
 
     def encodeHex(self, value):
         v = int(value)
-        if v < 10:
-            return '{0}'.format(value)
         if v > 15:
             return 'E'
-        return str(hex(v)).upper()[2:]
+        if v < 0:
+            return '{0}'.format(value)
+        return _HEX[v]
     
-    def validate(self, uartCmd):
-        if len(uartCmd.cmdStr) != uartCommand.commandlen():
-            raise UARTChecksumError("Invalid uartCommand length = {0}".format(len(uartCmd.cmdStr)))
-        if (uartCmd.digit < 0) or (uartCmd.digit > hourMinutesDigit.conductor):
+    @staticmethod
+    def validate(uartCmd):
+        if (uartCmd.digit < 0) or (uartCmd.digit > _MAX_DIGIT):
             raise UARTInvalidDigit("Invalid uartCommand digit = {0}".format(uartCmd.digit))
         return True
 
@@ -312,13 +365,13 @@ async def main():
     uart = uartProtocol(ch, commandHelper.baudRate[3])
 
     while True:
-        cmdStr = input("Send command string [Digit(0-3) Action(0-9) Value(0-99)]: ")
+        cmdStr = input("Send command string [Digit(0-4) Action(0-9) Value(000-999)]: ")
         cmd = uartCommand(cmdStr)
         await uart.sendCommand(cmd)
         await asyncio.sleep(0.05)
         cmd = await uart.receiveCommand()
         if cmd is not None:
-            print("uart{0} command received: {1}".format(ch, cmd.cmdStr))
+            print("uart{0} command received: {1}".format(ch, cmd.cmdStr.decode()))
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
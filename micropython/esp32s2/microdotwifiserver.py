@@ -4,12 +4,84 @@ from common.config import Config
 import common.logging as logging
 import ujson
 import os
-from microdot import Microdot, send_file, Request
+from microdot import Microdot, Request
 import sys
-import _thread
+import uasyncio as asyncio
+import socket
+import gc
 # Add parent directory to path for importing stepper_motor
 from stepper_motor import StepperMotor28BYJ48
 
+WIFI_ACTIVE_TIMEOUT_MS = 20000
+WIFI_ACTIVE_POLL_MS = 100
+POLL_BACKOFF_MIN_MS_DEFAULT = 50
+POLL_BACKOFF_MAX_MS_DEFAULT = 2000
+GC_FREE_THRESHOLD_DEFAULT = 8192
+# Steps per blocking step() call between yields to the HTTP handlers (~80 ms at 1.25 ms/step)
+STEP_CHUNK_STEPS = 64
+# Not every port exposes TCP_NODELAY; the lwIP option number is 1
+_IPPROTO_TCP = getattr(socket, 'IPPROTO_TCP', 6)
+_TCP_NODELAY = getattr(socket, 'TCP_NODELAY', 1)
+
+# Fixed-shape JSON responses, filled with % instead of ujson.dumps on a dict
+_MOVE_OK_TMPL = b'{"status":"success","message":"Queued %d steps %s","queue_length":%d}'
+_QUEUE_FULL_TMPL = b'{"status":"error","message":"Queue is full","queue_length":%d}'
+_STATUS_TMPL = b'{"status":"success","queue_length":%d,"is_executing":%s,"total_steps":%d}'
+_CLEAR_OK = b'{"status":"success","message":"Queue cleared"}'
+_RESET_OK = b'{"status":"success","message":"Step counter reset to 0"}'
+_ERROR_TMPL = '{"status":"error","message":%s}'
+_LOG_FMT = "[%02d:%02d:%02d] %s"
+
+# Shared response headers; Microdot copies these into each Response
+JSON_HDR = {'Content-Type': 'application/json'}
+HTML_HDR = {'Content-Type': 'text/html'}
+
+_MOVE_NAMES = (b'"steps"', b'"direction"', b'"delay"')
+_MOVE_DEFAULTS = (1024, 1, None)
+
+def _parse_move(body):
+    """
+    Pull steps, direction and delay out of a flat /stepper/move JSON body
+    without building a dict. The scan is only trusted for a {...} body in
+    which every key present is written "key":value and at least one was
+    found; anything else goes through ujson, which raises on a bad body.
+    """
+    try:
+        stripped = body.strip()
+        if not (stripped.startswith(b'{') and stripped.endswith(b'}')):
+            raise ValueError
+        values = list(_MOVE_DEFAULTS)
+        matched = 0
+        for k in range(3):
+            name = _MOVE_NAMES[k]
+            i = body.find(name)
+            if i < 0:
+                continue
+            i += len(name)
+            if body[i:i + 1] != b':':
+                raise ValueError  # e.g. whitespace before the colon
+            i += 1
+            j = body.find(b',', i)
+            end = body.find(b'}', i)
+            if j < 0 or (0 <= end < j):
+                j = end
+            token = body[i:j].strip()
+            if token == b'null':
+                values[k] = None
+            elif b'.' in token or b'e' in token or b'E' in token:
+                values[k] = float(token)
+            else:
+                values[k] = int(token)
+            matched += 1
+        if not matched:
+            raise ValueError
+        return values
+    except Exception:
+        data = ujson.loads(body)
+        return (data.get('steps', _MOVE_DEFAULTS[0]),
+                data.get('direction', _MOVE_DEFAULTS[1]),
+                data.get('delay', _MOVE_DEFAULTS[2]))
+
 class AP_IF_Wifi:
     def __init__(self, configfilename, ssid='orthocyclic_winder', password='400coils'):
         self.ip_address = ""
@@ -25,84 +97,145 @@ class AP_IF_Wifi:
         Request.max_content_length = 1024 * 1024  # 1MB (change as needed)
         
         # Initialize stepper motor (adjust GPIO pins as needed)
-        self.stepper = StepperMotor28BYJ48(in1_pin=2, in2_pin=3, in3_pin=4, in4_pin=5, logger=self.log)
+        self.stepper = StepperMotor28BYJ48(in1_pin=2, in2_pin=3, in3_pin=4, in4_pin=5, logger=self.log, max_queue=32)
         # Explicitly ensure motor is off
         self.stepper.release()
         
-        # Queue processing control
-        self.queue_processing = True
-        self.queue_thread = None
+        # Queue processing control; the processor runs as a task on the server's event loop
+        self.queue_processing = False
+        self._queue_event = asyncio.Event()
+        # Idle re-check interval for commands queued without a wakeup, tunable from the config file
+        self.poll_backoff_min_ms = self._config_value('poll_backoff_min_ms', POLL_BACKOFF_MIN_MS_DEFAULT)
+        self.poll_backoff_max_ms = self._config_value('poll_backoff_max_ms', POLL_BACKOFF_MAX_MS_DEFAULT)
+        # Collect after a request once free heap drops below this many bytes
+        self.gc_free_threshold = self._config_value('gc_free_threshold', GC_FREE_THRESHOLD_DEFAULT)
         
-        # In-memory log buffer (last 1000 lines)
-        self.log_buffer = []
+        # In-memory log ring buffer (last 1000 lines)
         self.max_log_lines = 1000
+        self.log_buffer = [None] * self.max_log_lines
+        self._log_head = 0
+        self._log_count = 0
+        # Set True to also echo buffered lines through logging.info; lines logged
+        # with error=True always go to logging.error as well
+        self.log_echo = False
         
         # Track startup time for relative timestamps
         self.startup_time = time.time()
+
+        # Serve the control page from RAM instead of re-reading flash per request
+        with open('html/stepper.html', 'rb') as f:
+            self._stepper_html = f.read()
+        # The page only changes with a new upload, so its validator and headers are fixed too
+        self._stepper_etag = '"%x-%x"' % (len(self._stepper_html), hash(self._stepper_html) & 0xFFFFFFFF)
+        self._stepper_hdr = dict(HTML_HDR)
+        self._stepper_hdr['Content-Length'] = str(len(self._stepper_html))
+        self._stepper_hdr['ETag'] = self._stepper_etag
+        self._stepper_304_hdr = {'ETag': self._stepper_etag}
+        # /stepper/status headers are reused too; only their ETag is filled in per request
+        self._status_hdr = {'Content-Type': 'application/json', 'ETag': '', 'Cache-Control': 'no-cache'}
+        self._status_304_hdr = {'ETag': ''}
     
-    def log(self, message):
+    def _stepper_page_response(self, request):
+        if request.headers.get('If-None-Match') == self._stepper_etag:
+            return '', 304, self._stepper_304_hdr
+        return self._stepper_html, 200, self._stepper_hdr
+
+    def _config_value(self, name, default):
+        try:
+            return self.config.read(name)
+        except Exception:
+            return default
+
+    def log(self, message, error=False):
         """Add message to log buffer with elapsed time since startup."""
-        elapsed = time.time() - self.startup_time
-        hours = int(elapsed // 3600)
-        minutes = int((elapsed % 3600) // 60)
-        seconds = int(elapsed % 60)
-        log_entry = "[{:02d}:{:02d}:{:02d}] {}".format(hours, minutes, seconds, message)
-        self.log_buffer.append(log_entry)
-        if len(self.log_buffer) > self.max_log_lines:
-            self.log_buffer.pop(0)
-        logging.info(message)
+        elapsed = int(time.time() - self.startup_time)
+        minutes, seconds = divmod(elapsed, 60)
+        hours, minutes = divmod(minutes, 60)
+        log_entry = _LOG_FMT % (hours, minutes, seconds, message)
+        self.log_buffer[self._log_head] = log_entry
+        self._log_head = (self._log_head + 1) % self.max_log_lines
+        if self._log_count < self.max_log_lines:
+            self._log_count += 1
+        if error:
+            logging.error(message)
+        elif self.log_echo:
+            logging.info(message)
+
+    def _iter_log_lines(self):
+        """Yield buffered log lines from oldest to newest."""
+        n = self.max_log_lines
+        i = (self._log_head - self._log_count) % n
+        for _ in range(self._log_count):
+            yield self.log_buffer[i]
+            i = (i + 1) % n
 
     def __del__(self):
         self.wifi.disconnect()
         time.sleep(1)
     
-    def start_wifi(self):
+    async def start_wifi(self):
         """
         Start the WiFi access point with the given SSID and password.
         """
         try:
             self.wifi.config(ssid=self.ssid, password=self.password)
             self.wifi.active(True)
-            i = 10
-            while not self.wifi.active() and i > 0:
-                time.sleep(2)
-                i -= 1
+            if not self.wifi.active():
                 logging.info("Waiting for WiFi AP to be active")
+            deadline = time.ticks_add(time.ticks_ms(), WIFI_ACTIVE_TIMEOUT_MS)
+            while not self.wifi.active() and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+                await asyncio.sleep_ms(WIFI_ACTIVE_POLL_MS)
 
             if self.wifi.active():
                 self.ip_address = self.wifi.ifconfig()[0]
                 self.log(f'WiFi AP active, IP={self.ip_address}')
             else:
-                self.log("Failed to activate WiFi AP")
-                logging.error("Failed to activate WiFi AP")
+                self.log("Failed to activate WiFi AP", error=True)
         except Exception as e:
-            logging.error(f"Exception occurred while starting WiFi: {e}")
+            logging.error("Exception occurred while starting WiFi: %s", e)
             self.ip_address = ""
     
-    def _queue_processor_thread(self):
-        """Background thread to process stepper command queue."""
-        self.log("Queue processor thread started")
+    async def _queue_processor_coro(self):
+        """Event loop task that processes the stepper command queue."""
+        self.log("Queue processor task started")
+        backoff_ms = self.poll_backoff_min_ms
         while self.queue_processing:
-            # Execute queue continuously without frequent checks
-            if self.stepper.queue_length() > 0 and not self.stepper.is_executing_now():
+            # Wake immediately when a producer signals; otherwise re-check with exponential backoff
+            try:
+                await asyncio.wait_for_ms(self._queue_event.wait(), backoff_ms)
+            except asyncio.TimeoutError:
+                pass
+            self._queue_event.clear()
+            if not self.queue_processing:
+                break
+            if self.stepper.queue_length() == 0:
+                backoff_ms = min(backoff_ms * 2, self.poll_backoff_max_ms)
+                continue
+            backoff_ms = self.poll_backoff_min_ms
+            if not self.stepper.is_executing_now():
                 self.log(f"Processing queue with {self.stepper.queue_length()} commands")
-                # Process all queued commands
-                self.stepper.execute_all_queued()
+                # step() blocks the loop, so run commands in bounded chunks and let
+                # HTTP handlers (including /stepper/clear) in between them
+                while self.stepper.execute_queue(STEP_CHUNK_STEPS):
+                    await asyncio.sleep_ms(0)
+                self.stepper.release()
                 # Show step count after commands complete
                 self.log(f"Commands completed. Total steps: {self.stepper.get_step_count()}")
-            time.sleep(1.0)  # Sleep longer between queue checks
-        self.log("Queue processor thread stopped")
+        self.log("Queue processor task stopped")
     
+    def _notify_queue(self):
+        """Wake the queue processor task."""
+        self._queue_event.set()
+
     def start_queue_processor(self):
-        """Start the background queue processing thread."""
-        if self.queue_thread is None:
-            self.queue_processing = True
-            self.queue_thread = _thread.start_new_thread(self._queue_processor_thread, ())
-            logging.info("Queue processor started")
+        """Enable queue processing; the task is scheduled by run_server."""
+        self.queue_processing = True
+        logging.info("Queue processor started")
     
     def stop_queue_processor(self):
-        """Stop the background queue processing thread."""
+        """Stop the queue processing task."""
         self.queue_processing = False
+        self._notify_queue()
         logging.info("Queue processor stopped")
     
     def shutdownWifi(self):
@@ -123,26 +256,36 @@ class AP_IF_Wifi:
     def run_server(self):
         app = Microdot()
 
+        @app.before_request
+        async def no_delay(request):
+            # Responses go out as separate header and body writes; with Nagle on,
+            # the body can sit behind the client's delayed ACK
+            try:
+                request.sock[1].s.setsockopt(_IPPROTO_TCP, _TCP_NODELAY, 1)
+            except Exception:
+                pass
+
+        @app.after_request
+        async def collect_garbage(request, response):
+            # Collect while the live set is small instead of waiting for an allocation to fail
+            if gc.mem_free() < self.gc_free_threshold:
+                gc.collect()
+
         @app.route('/')
         async def index(request):
             logging.info("returning stepper page")
             #self.createIndex()
-            return send_file('html/stepper.html')
+            return self._stepper_page_response(request)
 
         @app.get('/stepper')
         async def stepper_page(request):
             logging.info('returning stepper motor control page')
-            return send_file('html/stepper.html')
+            return self._stepper_page_response(request)
         
         @app.post('/stepper/move')
         async def stepper_move(request):
-            self.log('Received stepper motor move command')
             try:
-                form = request.body.decode('utf-8')
-                data = ujson.loads(form)
-                steps = data.get('steps', 1024)
-                direction = data.get('direction', 1)
-                delay = data.get('delay', None)
+                steps, direction, delay = _parse_move(request.body)
                 
                 self.log(f'Queueing: {steps} steps {"forward" if direction == 1 else "backward"}')
                 
@@ -150,104 +293,99 @@ class AP_IF_Wifi:
                 success = self.stepper.queue_step(steps, direction, delay)
                 
                 if success:
-                    return ujson.dumps({
-                        'status': 'success',
-                        'message': f'Queued {steps} steps {"forward" if direction == 1 else "backward"}',
-                        'queue_length': self.stepper.queue_length()
-                    }), 200, {'Content-Type': 'application/json'}
+                    self._notify_queue()
+                    return _MOVE_OK_TMPL % (
+                        steps,
+                        b'forward' if direction == 1 else b'backward',
+                        self.stepper.queue_length()
+                    ), 200, JSON_HDR
                 else:
-                    return ujson.dumps({
-                        'status': 'error',
-                        'message': 'Queue is full',
-                        'queue_length': self.stepper.queue_length()
-                    }), 503, {'Content-Type': 'application/json'}
+                    return _QUEUE_FULL_TMPL % self.stepper.queue_length(), 503, JSON_HDR
             except Exception as e:
-                logging.error(f"Error queueing stepper motor command: {e}")
-                return ujson.dumps({
-                    'status': 'error',
-                    'message': str(e)
-                }), 500, {'Content-Type': 'application/json'}
+                logging.error("Error queueing stepper motor command: %s", e)
+                return _ERROR_TMPL % ujson.dumps(str(e)), 500, JSON_HDR
 
         @app.get('/stepper/status')
         async def stepper_status(request):
             try:
-                current_status = {
-                    'queue_length': self.stepper.queue_length(),
-                    'is_executing': self.stepper.is_executing_now(),
-                    'total_steps': self.stepper.get_step_count()
-                }
-                response_data = {'status': 'success'}
-                response_data.update(current_status)
-                return ujson.dumps(response_data), 200, {'Content-Type': 'application/json'}
+                queue_length = self.stepper.queue_length()
+                is_executing = self.stepper.is_executing_now()
+                total_steps = self.stepper.get_step_count()
+                # Pollers that send back the last ETag get an empty 304 while nothing changed
+                etag = '"%d-%d-%d"' % (queue_length, 1 if is_executing else 0, total_steps)
+                if request.headers.get('If-None-Match') == etag:
+                    self._status_304_hdr['ETag'] = etag
+                    return '', 304, self._status_304_hdr
+                self._status_hdr['ETag'] = etag
+                return _STATUS_TMPL % (
+                    queue_length,
+                    b'true' if is_executing else b'false',
+                    total_steps
+                ), 200, self._status_hdr
             except Exception as e:
-                logging.error(f"Error getting stepper status: {e}")
-                return ujson.dumps({
-                    'status': 'error',
-                    'message': str(e)
-                }), 500, {'Content-Type': 'application/json'}
+                logging.error("Error getting stepper status: %s", e)
+                return _ERROR_TMPL % ujson.dumps(str(e)), 500, JSON_HDR
         
         @app.post('/stepper/clear')
         async def stepper_clear(request):
             logging.info('Clearing stepper command queue')
             try:
                 self.stepper.clear_queue()
-                return ujson.dumps({
-                    'status': 'success',
-                    'message': 'Queue cleared'
-                }), 200, {'Content-Type': 'application/json'}
+                return _CLEAR_OK, 200, JSON_HDR
             except Exception as e:
-                logging.error(f"Error clearing stepper queue: {e}")
-                return ujson.dumps({
-                    'status': 'error',
-                    'message': str(e)
-                }), 500, {'Content-Type': 'application/json'}
+                logging.error("Error clearing stepper queue: %s", e)
+                return _ERROR_TMPL % ujson.dumps(str(e)), 500, JSON_HDR
         
         @app.post('/stepper/reset_counter')
         async def stepper_reset_counter(request):
             logging.info('Resetting stepper step counter')
             try:
                 self.stepper.reset_step_count()
-                return ujson.dumps({
-                    'status': 'success',
-                    'message': 'Step counter reset to 0'
-                }), 200, {'Content-Type': 'application/json'}
+                return _RESET_OK, 200, JSON_HDR
             except Exception as e:
-                logging.error(f"Error resetting stepper counter: {e}")
-                return ujson.dumps({
-                    'status': 'error',
-                    'message': str(e)
-                }), 500, {'Content-Type': 'application/json'}
+                logging.error("Error resetting stepper counter: %s", e)
+                return _ERROR_TMPL % ujson.dumps(str(e)), 500, JSON_HDR
         
         @app.get('/logs')
         async def get_logs(request):
             """Return log buffer as downloadable text file."""
             try:
-                log_content = "\n".join(self.log_buffer)
-                if not log_content:
+                if self._log_count:
+                    # Stream one line at a time rather than joining the whole buffer
+                    def log_content():
+                        for line in self._iter_log_lines():
+                            yield line
+                            yield "\n"
+                    log_content = log_content()
+                else:
                     log_content = "No logs available"
                 return log_content, 200, {
                     'Content-Type': 'text/plain',
                     'Content-Disposition': 'attachment; filename="microcontroller_log.txt"'
                 }
             except Exception as e:
-                logging.error(f"Error retrieving logs: {e}")
+                logging.error("Error retrieving logs: %s", e)
                 return f"Error: {e}", 500, {'Content-Type': 'text/plain'}
 
         @app.get('/shutdown')
         async def shutdown(request):
-            print('shutting down microdot web service')
             logging.info('shutting down microdot web service')
             request.app.shutdown()
             return 'Shutting down', 200
 
-        app.run(host=self.ip_address, port=80)
+        async def serve():
+            if self.queue_processing:
+                asyncio.create_task(self._queue_processor_coro())
+            await app.start_server(host=self.ip_address, port=80)
+
+        asyncio.run(serve())
 
 # Example usage
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     try:
         apifWifi = AP_IF_Wifi("config.json")
-        apifWifi.start_wifi()
+        asyncio.run(apifWifi.start_wifi())
         if apifWifi.ip_address != "":
             apifWifi.start_queue_processor()  # Start queue processing before server
             apifWifi.run_server()
@@ -10,28 +10,50 @@ class SpindleMotor:
         self.pwm = PWM(Pin(pin), freq=freq, duty_u16=0)
         self.current = 0
         self.target = 0
-        self.ramp_rate = self.set_ramp_rate(10)  # default ramp rate
+        # Set whenever the target or ramp changes; run() waits on it once the ramp settles
+        self._evt = asyncio.Event()
+        # Duty clamps used by the ramp loop, computed once
+        self._max_duty = int(MAX_SPEED * 655.35)
+        self._min_duty = MIN_SPEED
+        # Set True to print the duty cycle once a second while ramping
+        self.debug = False
+        self.set_ramp_rate(10)  # default ramp rate
 
     def set_ramp_rate(self, rate):
         self.ramp_rate = int(rate * 655.35)  # Convert 0-100% to 0-65535
+        self._evt.set()
 
     def set_speed(self, duty):
         self.target = int(duty * 655.35)  # Convert 0-100% to 0-65535
+        self._evt.set()
 
     async def run(self):
+        tick = 0
         while True:
+            previous = self.current
             if self.current < self.target:
                 self.current += self.ramp_rate
-                if self.current >= int(MAX_SPEED * 655.35):
-                    self.current = int(MAX_SPEED * 655.35)
+                if self.current > self.target:
+                    self.current = self.target
+                if self.current >= self._max_duty:
+                    self.current = self._max_duty
             elif self.current > self.target:
                 self.current -= self.ramp_rate
-                if self.current <= MIN_SPEED:
-                    self.current = MIN_SPEED
+                if self.current < self.target:
+                    self.current = self.target
+                if self.current <= self._min_duty:
+                    self.current = self._min_duty
 
             self.pwm.duty_u16(self.current)
-            print(f"Current duty cycle: {self.current / 655.35:.1f}%")
+            if self.debug and tick % 5 == 0:
+                print("Current duty cycle: %.1f%%" % (self.current / 655.35))
+            tick += 1
 
+            if self.current == previous:
+                # Ramp has settled; sleep until set_speed or set_ramp_rate changes something
+                self._evt.clear()
+                await self._evt.wait()
+                continue
             await asyncio.sleep_ms(200)
 
 async def main():
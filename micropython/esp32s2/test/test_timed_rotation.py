@@ -6,6 +6,7 @@ Tests stepper motor with queued commands and no delay.
 from micropython.esp32s2.stepper_motor import StepperMotor28BYJ48
 import time
 import _thread
+import sys
 
 MIN_DELAY_S = 0.00125  # Minimum delay between steps in seconds
 
@@ -26,14 +27,25 @@ def test_queued_rotation():
     
     # Queue processor thread
     queue_processing = [True]
+    # Held by the test; the processor releases it each time it drains the queue
+    done_lock = _thread.allocate_lock()
+    done_lock.acquire()
     
     def queue_processor():
         """Background thread to process stepper command queue."""
         print("[QueueProcessor] Thread started")
+        backoff = 0.05
         while queue_processing[0]:
             if motor.queue_length() > 0 and not motor.is_executing_now():
                 motor.execute_all_queued()
-            time.sleep(0.005)
+                if done_lock.locked():
+                    done_lock.release()
+                # Loop straight back in case more work arrived meanwhile
+                backoff = 0.05
+                continue
+            # Idle: back off between checks, up to 500ms
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 0.5)
         print("[QueueProcessor] Thread stopped")
     
     try:
@@ -49,35 +61,43 @@ def test_queued_rotation():
         dir = 1  # Clockwise direction
         for t in range(TOTAL_REVS):
         # Queue the full rotation with 1ms delay
+            # Collect this iteration's output and write it once, so console
+            # writes don't hold up the motor thread mid-measurement
+            out = []
             if t % 2 == 0:
-                print(f"\nIteration {t+1}: Clockwise rotation")
+                out.append("\nIteration %d: Clockwise rotation\n" % (t+1))
                 dir = 1
             else:
-                print(f"\nIteration {t+1}: Counter-clockwise rotation")
+                out.append("\nIteration %d: Counter-clockwise rotation\n" % (t+1))
                 dir = -1
             
             success = motor.queue_step(4096, direction=dir, delay=MIN_DELAY_S)
             if success:
-                print(f"Command queued successfully")
-                print(f"Queue length: {motor.queue_length()}")
+                out.append("Command queued successfully\n")
+                out.append("Queue length: %d\n" % motor.queue_length())
             else:
-                print("ERROR: Failed to queue command")
+                out.append("ERROR: Failed to queue command\n")
+                sys.stdout.write("".join(out))
                 return
             
-            print("\nWaiting for motor to complete...")
+            out.append("\nWaiting for motor to complete...\n")
+            sys.stdout.write("".join(out))
         
         # Wait for completion
+        done_lock.acquire()
         while motor.queue_length() > 0 or motor.is_executing_now():
-            time.sleep(0.1)
+            done_lock.acquire()
         
         total_elapsed = time.ticks_diff(time.ticks_ms(), start_time)
         
-        print(f"\n" + "="*60)
-        print(f"ROTATION COMPLETE")
-        print(f"="*60)
-        print(f"Total time: {total_elapsed}ms")
-        print(f"Total steps: {motor.get_step_count()}")
-        print(f"Average time per step: {total_elapsed/(4096*TOTAL_REVS):.2f}ms")
+        sys.stdout.write("".join((
+            "\n", "="*60, "\n",
+            "ROTATION COMPLETE\n",
+            "="*60, "\n",
+            "Total time: %dms\n" % total_elapsed,
+            "Total steps: %d\n" % motor.get_step_count(),
+            "Average time per step: %.2fms\n" % (total_elapsed/(4096*TOTAL_REVS)),
+        )))
         
     except KeyboardInterrupt:
         print("\n\nTest interrupted by user")
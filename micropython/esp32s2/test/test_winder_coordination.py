@@ -6,17 +6,39 @@ Automatically calculates maximum safe winder RPM based on stepper motor limitati
 
 from micropython.esp32s2.stepper_motor import StepperMotor28BYJ48
 import time
-import _thread
+import uasyncio as asyncio
+from array import array
+import micropython
+from micropython import const
+from collections import deque
 
 try:
     import ujson as json
 except ImportError:
     import json
 
+RAMP_POINTS = 64  # Samples per precomputed speed ramp
+_DEBUG = const(0)  # Set to 1 to log every wire completion
+_LOG_RING_LEN = const(32)  # Slot-loop messages held until the stepper is idle
+_STEP_CHUNK = const(16)  # Steps per blocking step() call before the slot scheduler gets back in
+
 
 class WinderCoordinator:
     """Coordinates winder motor and stepper motor for multi-layer winding."""
     
+    # Physical constants used when the config file has no winder section or omits a key
+    _DEFAULTS = {
+        'slots_per_rev': 16,
+        'lead_screw_pitch_mm': 1.25,
+        'steps_per_rev': 4096,
+        'min_step_delay_ms': 1.0,
+        'ramp_start_rpm': 5.0,
+        'ramp_duration_s': 3.0,
+        'ramp_down_wires': 3,
+        'ramp_end_rpm': 5.0,
+        'ramp_down_duration_s': 2.0,
+    }
+    
     def __init__(self, bobbin_length_mm, wire_diameter_mm, num_layers=1, config=None):
         """
         Initialize the winder coordinator.
@@ -27,29 +49,19 @@ class WinderCoordinator:
             num_layers: Number of layers to wind (default 1)
             config: Optional config dict with physical constants
         """
-        # Load physical constants from config or use defaults
+        # Overlay the config file's winder section on the defaults, then unpack once
+        cfg = dict(self._DEFAULTS)
         if config and 'winder' in config:
-            winder_config = config['winder']
-            self.SLOTS_PER_REV = winder_config.get('slots_per_rev', 16)
-            self.LEAD_SCREW_PITCH = winder_config.get('lead_screw_pitch_mm', 1.25)
-            self.STEPS_PER_REV = winder_config.get('steps_per_rev', 4096)
-            self.MIN_STEP_DELAY = winder_config.get('min_step_delay_ms', 1.0) / 1000.0  # Convert ms to seconds
-            self.ramp_start_rpm = winder_config.get('ramp_start_rpm', 5.0)
-            self.ramp_duration = winder_config.get('ramp_duration_s', 3.0)
-            self.ramp_down_wires = winder_config.get('ramp_down_wires', 3)
-            self.ramp_end_rpm = winder_config.get('ramp_end_rpm', 5.0)
-            self.ramp_down_duration = winder_config.get('ramp_down_duration_s', 2.0)
-        else:
-            # Default values
-            self.SLOTS_PER_REV = 16
-            self.LEAD_SCREW_PITCH = 1.25
-            self.STEPS_PER_REV = 4096
-            self.MIN_STEP_DELAY = 0.001
-            self.ramp_start_rpm = 5.0
-            self.ramp_duration = 3.0
-            self.ramp_down_wires = 3
-            self.ramp_end_rpm = 5.0
-            self.ramp_down_duration = 2.0
+            cfg.update(config['winder'])
+        self.SLOTS_PER_REV = cfg['slots_per_rev']
+        self.LEAD_SCREW_PITCH = cfg['lead_screw_pitch_mm']
+        self.STEPS_PER_REV = cfg['steps_per_rev']
+        self.MIN_STEP_DELAY = cfg['min_step_delay_ms'] / 1000.0  # Convert ms to seconds
+        self.ramp_start_rpm = cfg['ramp_start_rpm']
+        self.ramp_duration = cfg['ramp_duration_s']
+        self.ramp_down_wires = cfg['ramp_down_wires']
+        self.ramp_end_rpm = cfg['ramp_end_rpm']
+        self.ramp_down_duration = cfg['ramp_down_duration_s']
         
         self.bobbin_length = bobbin_length_mm
         self.wire_diameter = wire_diameter_mm
@@ -65,28 +77,47 @@ class WinderCoordinator:
             in3_pin=4,
             in4_pin=5
         )
+        # Bound once; the slot loop calls it positionally, with no kwargs dict per call
+        self._queue_step = self.stepper.queue_step
         
         # State tracking
         self.current_layer = 1
         self.current_wire = 0
         self.current_slot = 0
+        # Position within the current revolution and layer, advanced and wrapped per slot
+        self._slot_in_rev = 0
+        self._slot_in_layer = 0
+        self._wire_in_layer = 0
+        # Signed carriage position covered by the steps queued so far
+        self._queued_position = 0
         self.current_direction = 1  # 1 = forward, -1 = reverse
         self.layer_complete = False
         self.all_layers_complete = False
         self.layer_announced = True  # Layer 1 announced at simulation start
-        self.queue_processing = [True]
+        self._run_flag = array('B', [1])  # Cleared to stop the drain task
+        self._queue_event = asyncio.Event()  # Set whenever a slot queues steps
+        # Messages from the slot loop; printed by the drain task rather than inline
+        self._log_ring = deque((), _LOG_RING_LEN)
         
         # Track total steps queued to handle fractional steps per slot
         self.total_steps_queued = 0
+        # Full-speed steps accumulated but not yet handed to the stepper
+        self._pending_steps = 0
+        self._pending_direction = 1
     
     def calculate_parameters(self):
         """Calculate all timing and motion parameters."""
+        # Lengths in whole micrometres so the counts below are exact integer divisions
+        bobbin_um = int(round(self.bobbin_length * 1000))
+        wire_um = int(round(self.wire_diameter * 1000))
+        pitch_um = int(round(self.LEAD_SCREW_PITCH * 1000))
+        
         # Wire count per layer
-        self.wires_per_layer = int(self.bobbin_length / self.wire_diameter)
+        self.wires_per_layer = bobbin_um // wire_um
         self.total_wires = self.wires_per_layer * self.num_layers
         
         # Stepper motion per wire
-        self.steps_per_wire = int((self.wire_diameter / self.LEAD_SCREW_PITCH) * self.STEPS_PER_REV)
+        self.steps_per_wire = (wire_um * self.STEPS_PER_REV) // pitch_um
         self.time_per_wire = self.steps_per_wire * self.MIN_STEP_DELAY  # seconds
         
         # Total stepper motion for all layers
@@ -113,8 +144,27 @@ class WinderCoordinator:
         self.slots_per_layer = self.wires_per_layer * self.SLOTS_PER_REV
         self.total_slots = self.slots_per_layer * self.num_layers
         
-        # Steps to move per slot trigger (per layer)
-        self.steps_per_slot = self.steps_per_layer / self.slots_per_layer
+        # Steps to move per slot trigger (per layer), kept as an exact ratio
+        self.steps_per_slot_num = self.steps_per_wire
+        self.steps_per_slot_den = self.SLOTS_PER_REV
+        self.steps_per_slot = self.steps_per_slot_num / self.steps_per_slot_den  # For display
+        
+        # Carriage position to reach at the end of every slot of the whole wind.
+        # Odd layers run back from the far end, so direction is the sign of the change.
+        self._plan = array('l', [0] * self.total_slots)
+        i = 0
+        for layer in range(self.num_layers):
+            for slot in range(self.slots_per_layer):
+                steps_in_layer = ((slot + 1) * self.steps_per_slot_num) // self.steps_per_slot_den
+                self._plan[i] = steps_in_layer if layer % 2 == 0 else self.steps_per_layer - steps_in_layer
+                i += 1
+        # Slot interval at cruise speed; any longer interval means the winder is ramping
+        self._cruise_interval_us = self._slot_interval_us(self.safe_winder_rpm)
+        # With a whole number of steps per slot, full-speed slots can be queued once per revolution
+        if self.steps_per_slot_num % self.steps_per_slot_den == 0:
+            self._int_steps_per_slot = self.steps_per_slot_num // self.steps_per_slot_den
+        else:
+            self._int_steps_per_slot = None
     
     def print_parameters(self):
         """Print all calculated parameters."""
@@ -149,13 +199,14 @@ class WinderCoordinator:
         print(f"  Time per revolution: {60.0/self.safe_winder_rpm:.2f}s")
         print("="*70)
     
-    def simulate_slot_trigger(self, current_rpm=None):
+    @micropython.native
+    def simulate_slot_trigger(self, slot_interval_us=None):
         """
         Simulate a slot trigger from optical sensor.
         Queue stepper movement for this slot interval.
         
         Args:
-            current_rpm: Current winder RPM for calculating appropriate step delay
+            slot_interval_us: Current time between slots, for calculating appropriate step delay
         """
         if self.all_layers_complete:
             return False
@@ -163,75 +214,101 @@ class WinderCoordinator:
         # Announce layer start on first slot of new layer
         if not self.layer_announced:
             direction_str = "forward" if self.current_direction == 1 else "reverse"
-            print(f"\n[LAYER {self.current_layer} START] Direction: {direction_str}")
+            self._log(f"\n[LAYER {self.current_layer} START] Direction: {direction_str}")
             self.layer_announced = True
         
-        # Calculate target position after this slot (relative to current layer start)
-        slot_in_layer = self.current_slot % self.slots_per_layer
-        target_steps_in_layer = int((slot_in_layer + 1) * self.steps_per_slot)
-        
-        # Calculate steps already queued in this layer
-        layer_start_steps = (self.current_layer - 1) * self.steps_per_layer
-        steps_queued_in_layer = self.total_steps_queued - layer_start_steps
-        
-        # Calculate how many steps to move
-        steps_to_move = target_steps_in_layer - steps_queued_in_layer
+        # Calculate how many steps to move to reach this slot's planned position
+        steps_to_move = self._plan[self.current_slot] - self._queued_position
+        direction = 1
+        if steps_to_move < 0:
+            steps_to_move = -steps_to_move
+            direction = -1
         
         # Calculate step delay based on current RPM for smooth motion
-        if current_rpm and current_rpm < self.safe_winder_rpm:
-            # During ramp-up or ramp-down, adjust step delay to match RPM
-            # Time available for this slot trigger
-            time_per_rev = 60.0 / current_rpm
-            time_per_slot = time_per_rev / self.SLOTS_PER_REV
-            # Divide by number of steps to get delay per step
-            step_delay = time_per_slot / steps_to_move if steps_to_move > 0 else self.MIN_STEP_DELAY
+        if slot_interval_us and slot_interval_us > self._cruise_interval_us and steps_to_move > 0:
+            # During ramp-up or ramp-down, spread this slot's time across its steps
+            step_delay = slot_interval_us / (1000000 * steps_to_move)
             # Don't go below minimum
-            step_delay = max(step_delay, self.MIN_STEP_DELAY)
+            if step_delay < self.MIN_STEP_DELAY:
+                step_delay = self.MIN_STEP_DELAY
         else:
             # At full speed, use minimum delay
             step_delay = self.MIN_STEP_DELAY
         
         # Queue the movement (only if steps > 0)
         if steps_to_move > 0:
-            success = self.stepper.queue_step(
-                steps_to_move,
-                direction=self.current_direction,
-                delay=step_delay
-            )
-            
-            if not success:
-                print(f"[WARNING] Failed to queue steps at slot {self.current_slot}")
-                return False
+            if self._int_steps_per_slot is not None and step_delay == self.MIN_STEP_DELAY:
+                # Full speed: accumulate and queue one command per winder revolution
+                self._pending_steps += steps_to_move
+                self._pending_direction = direction
+                if self._slot_in_rev + 1 == self.SLOTS_PER_REV and not self._flush_pending():
+                    self._pending_steps -= steps_to_move
+                    return False
+            else:
+                # Keep commands in order: anything batched goes out first
+                if self._pending_steps and not self._flush_pending():
+                    return False
+                success = self._queue_step(steps_to_move, direction, step_delay)
+                
+                if not success:
+                    self._log(f"[WARNING] Failed to queue steps at slot {self.current_slot}")
+                    return False
+                self._queue_event.set()
             
             # Update total steps queued
             self.total_steps_queued += steps_to_move
+            self._queued_position += direction * steps_to_move
         
         # Update counters
         self.current_slot += 1
-        wire_in_layer = (self.current_slot % self.slots_per_layer) // self.SLOTS_PER_REV
+        self._slot_in_rev += 1
+        self._slot_in_layer += 1
         
         # Check if we've moved to next wire position
-        if self.current_slot % self.SLOTS_PER_REV == 0:
+        if self._slot_in_rev == self.SLOTS_PER_REV:
+            self._slot_in_rev = 0
+            self._wire_in_layer += 1
             self.current_wire += 1
-            if wire_in_layer < self.wires_per_layer:
-                print(f"[Layer {self.current_layer}] Wire {wire_in_layer}/{self.wires_per_layer} complete")
+            if self._wire_in_layer < self.wires_per_layer:
+                if _DEBUG:
+                    self._log(f"[Layer {self.current_layer}] Wire {self._wire_in_layer}/{self.wires_per_layer} complete")
         
         # Check if current layer queueing is complete
-        if self.current_slot % self.slots_per_layer == 0 and self.current_slot > 0:
+        if self._slot_in_layer == self.slots_per_layer:
+            self._slot_in_layer = 0
+            self._wire_in_layer = 0
             self.layer_complete = True
-            print(f"\n[QUEUEING COMPLETE - Layer {self.current_layer}] All {steps_queued_in_layer + steps_to_move} steps queued")
-            print(f"Queue length: {self.stepper.queue_length()} commands remaining")
+            self._log(f"\n[QUEUEING COMPLETE - Layer {self.current_layer}] All {self.steps_per_layer} steps queued")
+            self._log(f"Queue length: {self.stepper.queue_length()} commands remaining")
             
             # Check if all layers are complete
             if self.current_layer >= self.num_layers:
                 self.all_layers_complete = True
-                print(f"\n[ALL LAYERS QUEUED] Total {self.total_steps_queued} steps queued")
+                self._log(f"\n[ALL LAYERS QUEUED] Total {self.total_steps_queued} steps queued")
             else:
                 # Start next layer
                 self.start_next_layer()
         
         return True
     
+    def _log(self, message):
+        """Buffer a message from the slot loop; the oldest is dropped when the ring is full."""
+        self._log_ring.append(message)
+    
+    def _print_log(self):
+        """Print and discard buffered slot-loop messages."""
+        while self._log_ring:
+            print(self._log_ring.popleft())
+    
+    def _flush_pending(self):
+        """Queue the steps accumulated from full-speed slots as one command."""
+        if not self._queue_step(self._pending_steps, self._pending_direction, self.MIN_STEP_DELAY):
+            self._log(f"[WARNING] Failed to queue steps at slot {self.current_slot}")
+            return False
+        self._pending_steps = 0
+        self._queue_event.set()
+        return True
+    
     def start_next_layer(self):
         """Start the next layer with reversed direction."""
         self.current_layer += 1
@@ -239,39 +316,75 @@ class WinderCoordinator:
         self.current_direction *= -1  # Reverse direction
         self.layer_announced = False  # Will announce on first slot trigger
     
-    def queue_processor(self):
-        """Background thread to process stepper command queue."""
-        print("[QueueProcessor] Thread started")
-        while self.queue_processing[0]:
-            if self.stepper.queue_length() > 0 and not self.stepper.is_executing_now():
-                self.stepper.execute_all_queued()
-            time.sleep(0.005)
-        print("[QueueProcessor] Thread stopped")
+    def _slot_interval_us(self, rpm):
+        """Time between slot triggers in microseconds at the given winder RPM."""
+        return int(60000000 / (rpm * self.SLOTS_PER_REV))
+    
+    def _build_ramp(self, from_rpm, to_rpm):
+        """Return the slot intervals (us) of a linear RPM ramp sampled at RAMP_POINTS points."""
+        return array('L', [self._slot_interval_us(from_rpm + (to_rpm - from_rpm) * i / RAMP_POINTS)
+                           for i in range(RAMP_POINTS)])
+    
+    async def _drain_queue(self):
+        """Event loop task that processes the stepper command queue."""
+        print("[QueueProcessor] Task started")
+        run_flag = self._run_flag
+        while run_flag[0]:
+            await self._queue_event.wait()
+            self._queue_event.clear()
+            # step() blocks, so run commands a chunk at a time and let the slot
+            # scheduler in between chunks rather than only between whole moves
+            while self.stepper.execute_queue(_STEP_CHUNK):
+                await asyncio.sleep_ms(0)
+            # Stepper is idle: a good time for console output
+            self._print_log()
+        print("[QueueProcessor] Task stopped")
+    
+    async def _sleep_until_us(self, deadline):
+        """Yield to the event loop until deadline, finishing the sub-millisecond remainder with sleep_us."""
+        wait_us = time.ticks_diff(deadline, time.ticks_us())
+        # Always yield at least once so the drain task runs even when we're behind
+        await asyncio.sleep_ms(wait_us // 1000 if wait_us > 0 else 0)
+        wait_us = time.ticks_diff(deadline, time.ticks_us())
+        if wait_us > 0:
+            time.sleep_us(wait_us)
     
-    def run_simulation(self):
+    async def run_simulation(self):
         """Run the complete multi-layer winding simulation."""
         print("\n" + "="*70)
         print(f"STARTING {self.num_layers}-LAYER WINDING SIMULATION")
         print("="*70)
         
-        # Start queue processor thread
-        _thread.start_new_thread(self.queue_processor, ())
-        time.sleep(0.1)
+        # Start queue processor task
+        drain_task = asyncio.create_task(self._drain_queue())
+        await asyncio.sleep_ms(0)
         
         print(f"\nWinder motor ramp-up: {self.ramp_start_rpm:.1f} RPM → {self.safe_winder_rpm:.2f} RPM over {self.ramp_duration:.1f}s")
         print(f"Ramp-down: Last {self.ramp_down_wires} wires slow to {self.ramp_end_rpm:.1f} RPM over {self.ramp_down_duration:.1f}s")
         print(f"Expected completion time: {self.total_time:.1f}s\n")
         
+        # Speeds are kept as slot intervals throughout, looked up from precomputed tables
+        ramp_up_us = self._build_ramp(self.ramp_start_rpm, self.safe_winder_rpm)
+        ramp_down_us = self._build_ramp(self.safe_winder_rpm, self.ramp_end_rpm)
+        cruise_us = self._cruise_interval_us
+        end_us = self._slot_interval_us(self.ramp_end_rpm)
+        ramp_duration_ms = int(self.ramp_duration * 1000)
+        ramp_down_duration_ms = int(self.ramp_down_duration * 1000)
+        
         start_time = time.ticks_ms()
-        last_slot_time = start_time
-        last_rpm = self.ramp_start_rpm
+        # Slot deadlines run on the microsecond clock; sub-5ms intervals need better than 1ms resolution
+        last_slot_time = time.ticks_us()
+        # Print a speed line once the slot interval leaves the +/-5% band around the last one printed
+        last_interval_us = self._slot_interval_us(self.ramp_start_rpm)
+        log_hi_us = last_interval_us + last_interval_us // 20
+        log_lo_us = last_interval_us - last_interval_us // 20
         ramp_down_start_time = None
         
         try:
             # Simulate slot triggers with dynamic RPM
             while not self.all_layers_complete:
                 current_time = time.ticks_ms()
-                elapsed_time = time.ticks_diff(current_time, start_time) / 1000.0  # seconds
+                elapsed_ms = time.ticks_diff(current_time, start_time)
                 
                 # Determine if we should start ramping down
                 wires_remaining = self.total_wires - self.current_wire
@@ -285,37 +398,41 @@ class WinderCoordinator:
                         ramp_down_start_time = current_time
                         print(f"\n[RAMP DOWN START] {wires_remaining} wires remaining, slowing to {self.ramp_end_rpm:.1f} RPM\n")
                     
-                    ramp_down_elapsed = time.ticks_diff(current_time, ramp_down_start_time) / 1000.0
-                    if ramp_down_elapsed < self.ramp_down_duration:
+                    ramp_down_elapsed_ms = time.ticks_diff(current_time, ramp_down_start_time)
+                    if ramp_down_elapsed_ms < ramp_down_duration_ms:
                         # Linear ramp from current speed to end RPM
-                        ramp_progress = ramp_down_elapsed / self.ramp_down_duration
-                        current_rpm = self.safe_winder_rpm - (self.safe_winder_rpm - self.ramp_end_rpm) * ramp_progress
+                        slot_interval_us = ramp_down_us[ramp_down_elapsed_ms * RAMP_POINTS // ramp_down_duration_ms]
                     else:
                         # At minimum speed
-                        current_rpm = self.ramp_end_rpm
-                elif elapsed_time < self.ramp_duration:
+                        slot_interval_us = end_us
+                elif elapsed_ms < ramp_duration_ms:
                     # Linear ramp from start_rpm to safe_winder_rpm
-                    ramp_progress = elapsed_time / self.ramp_duration
-                    current_rpm = self.ramp_start_rpm + (self.safe_winder_rpm - self.ramp_start_rpm) * ramp_progress
+                    slot_interval_us = ramp_up_us[elapsed_ms * RAMP_POINTS // ramp_duration_ms]
                 else:
                     # At full speed
-                    current_rpm = self.safe_winder_rpm
-                
-                # Calculate slot interval based on current RPM
-                time_per_revolution = 60.0 / current_rpm
-                slot_interval = time_per_revolution / self.SLOTS_PER_REV
-                
-                # Show RPM changes
-                if abs(current_rpm - last_rpm) >= 1.0:  # Log when RPM changes by 1 or more
-                    print(f"[Winder RPM: {current_rpm:.1f}] Slot interval: {slot_interval*1000:.2f}ms")
-                    last_rpm = current_rpm
+                    slot_interval_us = cruise_us
                 
-                # Check if it's time for next slot trigger
-                if time.ticks_diff(current_time, last_slot_time) >= slot_interval * 1000:
-                    self.simulate_slot_trigger(current_rpm)
-                    last_slot_time = current_time
+                # Show speed changes
+                if slot_interval_us >= log_hi_us or slot_interval_us <= log_lo_us:
+                    current_rpm = 60000000 / (slot_interval_us * self.SLOTS_PER_REV)
+                    print(f"[Winder RPM: {current_rpm:.1f}] Slot interval: {slot_interval_us/1000:.2f}ms")
+                    log_hi_us = slot_interval_us + slot_interval_us // 20
+                    log_lo_us = slot_interval_us - slot_interval_us // 20
                 
-                time.sleep(0.001)  # Small sleep to prevent busy waiting
+                # Sleep until the next slot is due. The deadline is measured from the
+                # previous deadline, not from when we woke, so lateness doesn't accumulate
+                next_slot_deadline = time.ticks_add(last_slot_time, slot_interval_us)
+                await self._sleep_until_us(next_slot_deadline)
+                self.simulate_slot_trigger(slot_interval_us)
+                now_us = time.ticks_us()
+                if time.ticks_diff(now_us, next_slot_deadline) > slot_interval_us:
+                    # More than a whole slot late: re-anchor on now instead of
+                    # firing the missed slots back to back
+                    last_slot_time = now_us
+                else:
+                    last_slot_time = next_slot_deadline
+            
+            self._print_log()
             
             # Wait for all queued commands to complete
             print(f"\nWaiting for stepper motor to execute remaining queued commands...")
@@ -324,9 +441,7 @@ class WinderCoordinator:
             
             # Wait until all expected steps are executed
             while True:
-                queue_len = self.stepper.queue_length()
-                is_exec = self.stepper.is_executing_now()
-                steps_done = self.stepper.get_step_count()
+                queue_len, is_exec, steps_done = self.stepper.status()
                 
                 # Exit only when queue is empty, not executing, and all steps are done
                 if queue_len == 0 and not is_exec and steps_done >= self.total_steps:
@@ -339,7 +454,7 @@ class WinderCoordinator:
                     print(f"Queue: {queue_len}, Executing: {is_exec}, Steps: {steps_done}/{self.total_steps}")
                     break
                 
-                time.sleep(0.1)
+                await asyncio.sleep_ms(100)
             
             print(f"\n[EXECUTION COMPLETE] All motor movements finished")
             print(f"Final steps executed: {self.stepper.get_step_count()}/{self.total_steps}")
@@ -361,23 +476,55 @@ class WinderCoordinator:
         except Exception as e:
             print(f"\n\nSimulation failed with error: {e}")
         finally:
-            # Stop queue processor thread
-            self.queue_processing[0] = False
-            time.sleep(0.2)
+            # Stop queue processor task
+            self._run_flag[0] = 0
+            self._queue_event.set()
+            await drain_task
             
             # Release motor
             self.stepper.release()
             print("\nMotor coils released")
 
 
+_CFG_CACHE = None
+
+
 def load_config():
-    """Load complete configuration from config file."""
+    """
+    Load complete configuration, once per run; later calls return the same dict.
+    Uses the precompiled test_winder_coordination_cfg module when it is on the
+    path (see write_config_module), otherwise parses the JSON config file.
+    An empty dict is cached if neither is available.
+    """
+    global _CFG_CACHE
+    if _CFG_CACHE is not None:
+        return _CFG_CACHE
+    try:
+        from test_winder_coordination_cfg import CONFIG
+        _CFG_CACHE = CONFIG
+        return _CFG_CACHE
+    except ImportError:
+        pass
     try:
         with open('test/test_winder_coordination.json', 'r') as f:
-            return json.load(f)
+            _CFG_CACHE = json.loads(f.read())
     except Exception as e:
         print(f"Warning: Could not load test_winder_coordination.json: {e}")
-        return None
+        _CFG_CACHE = {}
+    return _CFG_CACHE
+
+
+def write_config_module(path='test_winder_coordination_cfg.py'):
+    """
+    Write the JSON config out as a Python module with a CONFIG literal.
+    Cross-compile it with mpy-cross or freeze it into the firmware so the
+    config is imported from flash instead of parsed at every run.
+    """
+    with open('test/test_winder_coordination.json', 'r') as f:
+        config = json.load(f)
+    with open(path, 'w') as f:
+        f.write('# Generated from test/test_winder_coordination.json by write_config_module()\n')
+        f.write('CONFIG = %r\n' % (config,))
 
 
 def load_wire_specs():
@@ -457,7 +604,7 @@ def main():
     print("Press Ctrl+C to stop at any time.\n")
     
     # Run simulation for selected wire
-    coordinators[wire_type].run_simulation()
+    asyncio.run(coordinators[wire_type].run_simulation())
 
 
 if __name__ == "__main__":
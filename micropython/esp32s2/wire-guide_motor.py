@@ -1,6 +1,10 @@
-from machine import Pin
+from machine import Pin, mem32
+from array import array
 import time
-from collections import deque
+
+# ESP32-S2 GPIO write-1-to-set / write-1-to-clear output registers, per bank
+_GPIO_OUT_W1TS = (0x3F404008, 0x3F404014)  # GPIO0-31, GPIO32-53
+_GPIO_OUT_W1TC = (0x3F40400C, 0x3F404018)
 
 class StepperMotor28BYJ48:
     """
@@ -23,13 +27,15 @@ class StepperMotor28BYJ48:
     STEPS_PER_REV = 4096  # With gear reduction and 8-step sequence
     MIN_DELAY_S = 0.00125  # Minimum delay between steps for this motor (1.25ms)  
     
-    def __init__(self, in1_pin, in2_pin, in3_pin, in4_pin, logger=None):
+    def __init__(self, in1_pin, in2_pin, in3_pin, in4_pin, logger=None, max_queue=100, verbose=True):
         """
         Initialize the stepper motor.
         
         Args:
             in1_pin, in2_pin, in3_pin, in4_pin: GPIO pin numbers for motor control
             logger: Optional logging function to call with log messages
+            max_queue: Number of command slots, allocated once up front
+            verbose: Log each executed command; False skips building the messages
         """
         self.pins = [
             Pin(in1_pin, Pin.OUT, value=0),
@@ -40,27 +46,111 @@ class StepperMotor28BYJ48:
         
         # Use 8-step sequence
         self.sequence = self.FULL_STEP_SEQUENCE
+        
+        # Hot-path copies: rows as tuples and each pin's bound value() method
+        self._seq = tuple(tuple(row) for row in self.sequence)
+        self._seq_mask = len(self._seq) - 1  # Step index wraps with & instead of %
+        assert len(self._seq) & self._seq_mask == 0, "sequence length must be a power of two"
+        self._p0, self._p1, self._p2, self._p3 = (p.value for p in self.pins)
+        
+        # For the Pin.value() path: moving into row i from its neighbour only
+        # needs the coils that differ. A half-step changes one coil, so
+        # _pin_edges[direction] = (value method per row, new value per row)
+        self._pin_edges = {}
+        setters = (self._p0, self._p1, self._p2, self._p3)
+        for d in (1, -1):
+            funcs = []
+            vals = []
+            for i, row in enumerate(self._seq):
+                prev = self._seq[(i - d) & self._seq_mask]
+                changed = [k for k in range(4) if row[k] != prev[k]]
+                if len(changed) != 1:
+                    break
+                funcs.append(setters[changed[0]])
+                vals.append(row[changed[0]])
+            else:
+                self._pin_edges[d] = (tuple(funcs), tuple(vals))
+        
+        # When all four pins share a GPIO bank, each step is one set-mask and
+        # one clear-mask register write instead of four Pin.value() calls
+        pin_nums = (in1_pin, in2_pin, in3_pin, in4_pin)
+        bank = in1_pin >> 5
+        if all(n >> 5 == bank for n in pin_nums):
+            pins_mask = 0
+            for n in pin_nums:
+                pins_mask |= 1 << (n & 31)
+            set_masks = [sum(1 << (n & 31) for n, bit in zip(pin_nums, row) if bit)
+                         for row in self._seq]
+            self._set_masks = array('I', set_masks)
+            self._clr_masks = array('I', [pins_mask & ~m for m in set_masks])
+            self._pins_mask = pins_mask
+            self._w1ts = _GPIO_OUT_W1TS[bank]
+            self._w1tc = _GPIO_OUT_W1TC[bank]
             
-        self.current_step = 0
+            # Half-steps flip exactly one coil, so moving into row i from its
+            # neighbour is a single store: the coil's bit to W1TS or to W1TC.
+            # _edges[direction] = (register per row, mask per row)
+            self._edges = {}
+            for d in (1, -1):
+                regs = array('I', [0] * len(set_masks))
+                masks = array('I', [0] * len(set_masks))
+                for i, m in enumerate(set_masks):
+                    diff = m ^ set_masks[(i - d) & self._seq_mask]
+                    if m & diff == diff:
+                        regs[i] = self._w1ts
+                    elif m & diff == 0:
+                        regs[i] = self._w1tc
+                    else:
+                        break  # Sequence sets and clears coils together
+                    masks[i] = diff
+                else:
+                    self._edges[d] = (regs, masks)
+        else:
+            self._w1ts = 0
+            self._edges = {}
+            
+        # State other tasks read lives in single-slot arrays, so each update is
+        # an in-place machine-word store rather than an attribute rebind
+        self._current_step = array('b', [0])
         self.step_delay = self.MIN_DELAY_S  # Default delay between steps (1.25ms)
         
-        # Command queue
-        self.command_queue = deque((), 100)  # Max 100 commands in queue
-        self.is_executing = False
+        # Command queue: a ring of parallel steps/direction/delay arrays, with a
+        # negative delay standing for None (use step_delay at execution time).
+        # Only queue_step advances _q_tail and only the executor advances _q_head,
+        # so the length is tail - head without a shared counter. clear_queue
+        # keeps to that by only recording the tail it saw in _q_clear; the
+        # executor moves _q_head up to it before taking its next command.
+        self.max_queue = max_queue
+        self._q_steps = array('l', [0] * max_queue)
+        self._q_dir = array('b', [0] * max_queue)
+        self._q_delay = array('f', [0.0] * max_queue)
+        self._q_head = 0
+        self._q_tail = 0
+        self._is_executing = array('b', [0])
+        self._q_clear = array('l', [0])
+        self._split_head = -1  # _q_head of a command execute_queue has part run
         
         # Step counter (total steps performed)
-        self.total_steps = 0
+        self._total_steps = array('l', [0])
         
         # Logger callback
         self.logger = logger
+        self.verbose = verbose
         
         # Ensure motor is off after initialization
         self.release()
     
     def _set_step(self, step):
         """Set the motor pins according to the step sequence."""
-        for i in range(4):
-            self.pins[i].value(self.sequence[step][i])
+        if self._w1ts:
+            mem32[self._w1ts] = self._set_masks[step]
+            mem32[self._w1tc] = self._clr_masks[step]
+            return
+        row = self._seq[step]
+        self._p0(row[0])
+        self._p1(row[1])
+        self._p2(row[2])
+        self._p3(row[3])
     
     def step(self, steps, direction=1, delay=None, release_after=True):
         """
@@ -76,13 +166,67 @@ class StepperMotor28BYJ48:
             delay = self.step_delay
         
         steps_to_perform = abs(steps)
-        for _ in range(steps_to_perform):
-            self._set_step(self.current_step)
-            self.current_step = (self.current_step + direction) % len(self.sequence)
-            time.sleep(delay)
+        
+        # Bind everything the loop touches to locals; write current_step back once
+        mask = self._seq_mask
+        ticks_us = time.ticks_us
+        ticks_add = time.ticks_add
+        ticks_diff = time.ticks_diff
+        sleep_us = time.sleep_us
+        cur = self._current_step[0]
+        
+        # Pace steps against a running microsecond deadline so the time spent
+        # writing pins is absorbed instead of added to every delay
+        delay_us = int(delay * 1000000)
+        deadline = ticks_us()
+        edge = self._edges.get(direction)
+        if edge:
+            regs, masks = edge
+            # Set the starting row outright, since the coils may be released or
+            # left by a move in the other direction; then one store per step
+            mem32[self._w1ts] = self._set_masks[cur]
+            mem32[self._w1tc] = self._clr_masks[cur]
+            for _ in range(steps_to_perform):
+                mem32[regs[cur]] = masks[cur]
+                cur = (cur + direction) & mask
+                deadline = ticks_add(deadline, delay_us)
+                wait = ticks_diff(deadline, ticks_us())
+                if wait > 0:
+                    sleep_us(wait)
+                else:
+                    deadline = ticks_us()  # Running late: don't burst to catch up
+        elif direction in self._pin_edges:
+            funcs, vals = self._pin_edges[direction]
+            self._set_step(cur)  # Starting row outright, then one pin per step
+            for _ in range(steps_to_perform):
+                funcs[cur](vals[cur])
+                cur = (cur + direction) & mask
+                deadline = ticks_add(deadline, delay_us)
+                wait = ticks_diff(deadline, ticks_us())
+                if wait > 0:
+                    sleep_us(wait)
+                else:
+                    deadline = ticks_us()  # Running late: don't burst to catch up
+        else:
+            p0, p1, p2, p3 = self._p0, self._p1, self._p2, self._p3
+            seq = self._seq
+            for _ in range(steps_to_perform):
+                row = seq[cur]
+                p0(row[0])
+                p1(row[1])
+                p2(row[2])
+                p3(row[3])
+                cur = (cur + direction) & mask
+                deadline = ticks_add(deadline, delay_us)
+                wait = ticks_diff(deadline, ticks_us())
+                if wait > 0:
+                    sleep_us(wait)
+                else:
+                    deadline = ticks_us()  # Running late: don't burst to catch up
+        self._current_step[0] = cur
         
         # Update counter once after all steps complete (atomic write)
-        self.total_steps += steps_to_perform
+        self._total_steps[0] += steps_to_perform
         
         # Optionally de-energize coils after completing movement
         if release_after:
@@ -90,6 +234,9 @@ class StepperMotor28BYJ48:
     
     def release(self):
         """Turn off all motor coils to save power and prevent heating."""
+        if self._w1ts:
+            mem32[self._w1tc] = self._pins_mask
+            return
         for pin in self.pins:
             pin.value(0)
     
@@ -105,49 +252,119 @@ class StepperMotor28BYJ48:
         Returns:
             bool: True if added successfully, False if queue is full
         """
-        if len(self.command_queue) >= 100:
+        tail = self._q_tail
+        if tail - self._q_head >= self.max_queue:
             return False
         
-        self.command_queue.append({
-            'type': 'step',
-            'steps': steps,
-            'direction': direction,
-            'delay': delay
-        })
+        i = tail % self.max_queue
+        self._q_steps[i] = steps
+        self._q_dir[i] = direction
+        self._q_delay[i] = -1.0 if delay is None else delay
+        self._q_tail = tail + 1  # Publish the slot only once it is filled
         return True
     
-    def execute_queue(self):
+    def _pop_command(self):
+        """Copy the oldest command out of its slot and free the slot."""
+        head = self._q_head
+        i = head % self.max_queue
+        steps = self._q_steps[i]
+        direction = self._q_dir[i]
+        delay = self._q_delay[i]
+        if delay < 0:
+            delay = None
+        self._q_head = head + 1
+        return steps, direction, delay
+    
+    def _apply_clear(self):
+        """Drop the commands a clear_queue call covered (executor side)."""
+        clear_to = self._q_clear[0]
+        if clear_to > self._q_head:
+            self._q_head = clear_to
+    
+    def _merge_head(self):
+        """
+        Fold the head command into the commands behind it while they share its
+        direction and delay, so they run as one move. Only the executor calls
+        this, and it only rewrites slots already published by queue_step.
+        Returns the number of commands now in the head slot.
+        """
+        mq = self.max_queue
+        i = self._q_head % mq
+        merged = 1
+        while self._q_tail - self._q_head > 1:
+            j = (self._q_head + 1) % mq
+            if self._q_dir[j] != self._q_dir[i] or self._q_delay[j] != self._q_delay[i]:
+                break
+            self._q_steps[j] = abs(self._q_steps[j]) + abs(self._q_steps[i])
+            self._q_head += 1
+            i = j
+            merged += 1
+        return merged
+    
+    def _log_command(self, steps, direction, queue_remaining, merged):
+        """Log a command as it starts executing."""
+        if not self.verbose:
+            return
+        log_msg = "Executing: %d steps %s (queue: %d)" % (
+            steps, "forward" if direction == 1 else "backward", queue_remaining)
+        if merged > 1:
+            log_msg += " (merged %d cmds)" % merged
+        if self.logger:
+            self.logger(log_msg)
+        else:
+            print(log_msg)
+    
+    def execute_queue(self, max_steps=None):
         """
         Execute one command from the queue.
         This allows new commands to be processed more responsively.
+        
+        Args:
+            max_steps: Run at most this many steps; the rest of the command
+                stays at the head of the queue for the next call
         """
         # Check if already executing (atomic read)
-        if self.is_executing:
+        if self._is_executing[0]:
             return False
         
+        self._apply_clear()
+        
         # Check if queue has commands
-        if not self.command_queue:
+        if self._q_tail == self._q_head:
             return False
         
         # Set executing flag (atomic write)
-        self.is_executing = True
+        self._is_executing[0] = 1
+        
+        # A command run for the first time is merged and logged, as in
+        # execute_all_queued; later chunks of it just continue
+        if self._split_head != self._q_head:
+            queue_remaining = self._q_tail - self._q_head
+            merged = self._merge_head()
+            i = self._q_head % self.max_queue
+            self._log_command(abs(self._q_steps[i]), self._q_dir[i], queue_remaining, merged)
         
-        # Get command from queue (popleft is atomic)
-        command = self.command_queue.popleft()
+        # Get command from queue, or split off its first max_steps
+        i = self._q_head % self.max_queue
+        steps = abs(self._q_steps[i])
+        if max_steps is not None and steps > max_steps:
+            self._q_steps[i] = steps - max_steps
+            self._split_head = self._q_head
+            steps = max_steps
+            direction = self._q_dir[i]
+            delay = self._q_delay[i]
+            if delay < 0:
+                delay = None
+        else:
+            steps, direction, delay = self._pop_command()
         
         # Execute without any locks to ensure smooth motion
         try:
-            if command['type'] == 'step':
-                # Always execute without releasing to maintain smooth motion
-                self.step(
-                    command['steps'],
-                    command['direction'],
-                    command['delay'],
-                    release_after=False
-                )
+            # Always execute without releasing to maintain smooth motion
+            self.step(steps, direction, delay, release_after=False)
         finally:
             # Clear executing flag (atomic write)
-            self.is_executing = False
+            self._is_executing[0] = 0
         
         return True
     
@@ -157,64 +374,71 @@ class StepperMotor28BYJ48:
         Keeps processing until queue is empty.
         Release coils only when completely done.
         """
-        if not self.command_queue:
+        self._apply_clear()
+        if self._q_tail == self._q_head:
             return
         
         # Set executing flag once for the entire batch
-        self.is_executing = True
+        self._is_executing[0] = 1
         
         try:
             # Process all commands without releasing executing flag
-            while self.command_queue:
-                command = self.command_queue.popleft()
+            while self._q_tail != self._q_head:
+                self._apply_clear()
+                if self._q_tail == self._q_head:
+                    break
+                queue_remaining = self._q_tail - self._q_head  # Include current command
                 
-                if command['type'] == 'step':
-                    # Log command details before execution
-                    direction_str = "forward" if command['direction'] == 1 else "backward"
-                    queue_remaining = len(self.command_queue) + 1  # Include current command
-                    log_msg = f"Executing: {command['steps']} steps {direction_str} (queue: {queue_remaining})"
-                    if self.logger:
-                        self.logger(log_msg)
-                    else:
-                        print(log_msg)
-                    
-                    # Execute without releasing coils or changing executing flag
-                    self.step(
-                        command['steps'],
-                        command['direction'],
-                        command['delay'],
-                        release_after=False
-                    )
+                # Fold following commands with the same direction and delay into
+                # this one, so they run as a single step() call
+                merged = self._merge_head()
+                steps, direction, delay = self._pop_command()
+                steps = abs(steps)
+                self._log_command(steps, direction, queue_remaining, merged)
+                
+                # Execute without releasing coils or changing executing flag
+                self.step(steps, direction, delay, release_after=False)
         finally:
             # Clear executing flag only after all commands complete
-            self.is_executing = False
+            self._is_executing[0] = 0
             
-            # Check if new commands were added during execution
-            if not self.command_queue:
-                time.sleep(0.05)  # Small delay before checking again
-                if not self.command_queue:  # Double-check queue is still empty
-                    self.release()
+            # Release straight away unless new commands arrived meanwhile; the
+            # next step() sets its starting row outright, so a release between
+            # batches never leaves the coils out of sequence
+            if self._q_tail == self._q_head:
+                self.release()
     
     def clear_queue(self):
         """Clear all commands from the queue."""
-        while self.command_queue:
-            self.command_queue.popleft()
+        # Mark everything published so far as dropped in one store; the executor
+        # advances _q_head past it, so _q_head keeps a single writer
+        self._q_clear[0] = self._q_tail
+    
+    def _queued(self):
+        """Commands still to run, counting a pending clear as done."""
+        head = self._q_head
+        clear_to = self._q_clear[0]
+        return self._q_tail - (clear_to if clear_to > head else head)
     
     def queue_length(self):
         """Return the number of commands in the queue."""
-        return len(self.command_queue)
+        return self._queued()
     
     def is_executing_now(self):
         """Check if motor is currently executing (atomic read, no lock)."""
-        return self.is_executing
+        return bool(self._is_executing[0])
     
     def get_step_count(self):
         """Return the total number of steps performed (atomic read)."""
-        return self.total_steps
+        return self._total_steps[0]
+    
+    def status(self):
+        """Return (queue_length, is_executing, total_steps) from a single call."""
+        return self._queued(), bool(self._is_executing[0]), self._total_steps[0]
     
     def reset_step_count(self):
         """Reset the step counter to zero."""
-        self.total_steps = 0
+        self._total_steps[0] = 0
 
 
 # Simple test function
@@ -1,8 +1,14 @@
-from machine import Pin, SoftI2C
+from machine import Pin, SoftI2C, mem32
 from time import ticks_ms, ticks_diff
 from array import array
 import uasyncio as asyncio
 import micropython
+import sys
+
+# On the RP2040 the DRDY IRQ reads the pin level straight from SIO GPIO_IN;
+# other ports, and pins outside GPIO0-29, fall back to Pin.value()
+_SIO_GPIO_IN = 0xD0000004  # RP2040 SIO input levels of GPIO0-29
+_RP2 = sys.platform == 'rp2'
 
 async def _sleep_ms(ms: int):
     if hasattr(asyncio, "sleep_ms"):
@@ -11,6 +17,44 @@ async def _sleep_ms(ms: int):
         await asyncio.sleep(ms / 1000)
 
 
+@micropython.viper
+def _find_extremes(arr: ptr32, n: int, ext: ptr32, k: int):
+    # One pass over arr[:n] keeping its k smallest values ascending in
+    # ext[0:k] and its k largest descending in ext[k:2k], by insertion
+    for i in range(n):
+        v = arr[i]
+
+        if i < k:
+            j = i
+        elif v < ext[k - 1]:
+            j = k - 1
+        else:
+            j = -1
+        if j >= 0:
+            while j > 0 and ext[j - 1] > v:
+                ext[j] = ext[j - 1]
+                j -= 1
+            ext[j] = v
+
+        if i < k:
+            j = i
+        elif v > ext[2 * k - 1]:
+            j = k - 1
+        else:
+            j = -1
+        if j >= 0:
+            while j > 0 and ext[k + j - 1] < v:
+                ext[k + j] = ext[k + j - 1]
+                j -= 1
+            ext[k + j] = v
+
+
+@micropython.viper
+def _drdy_count(counters: ptr32, rising: int):
+    counters[0] += 1
+    counters[2 - rising] += 1
+
+
 class NAU7802:
     # I2C address
     NAU7802_ADDR = 0x2A
@@ -30,6 +74,7 @@ class NAU7802:
     NAU7802_PU_CTRL_AVDDS = 7
     PGA_PWR_PGA_CAP_EN = 7
     CTRL2_CALS = 2
+    CTRL1_CRP = 7
     PU_CTRL_RR = 0
     PU_CTRL_PUD = 1
     PU_CTRL_PUA = 2
@@ -49,11 +94,21 @@ class NAU7802:
     DRDY_TRIGGER_FALLING = Pin.IRQ_FALLING
     DRDY_TRIGGER_BOTH = Pin.IRQ_RISING | Pin.IRQ_FALLING
 
+    # Config registers the chip never changes on its own; their last written
+    # value is cached so bit updates skip the read. PU_CTRL (PUR/CR status) and
+    # CTRL2 (self-clearing CALS) are always read live.
+    _SHADOWED_REGS = (CTRL1, ADC, PGA, PGA_PWR)
+
     def __init__(self, i2c, addr=0x2A, max_samples=1000):
         self.i2c = i2c
         self.addr = addr
         self.max_samples = max_samples
         self.data_arr_i = array('i', [0] * self.max_samples)
+        # Reused I2C buffers so register and sample reads don't allocate
+        self._adc_buf = bytearray(3)
+        self._reg_buf = bytearray(1)
+        self._shadow = {}
+        self._trim_buf = array('i', [0] * 10)
         self.offset = 0.0
         self.calibration_factor = 1.0
         self.zero_deadband = 0.0
@@ -61,10 +116,9 @@ class NAU7802:
         self.last_error = ""
         self._drdy_pin = None
         self._drdy_flag = None
-        self._drdy_irq_count = 0
-        self._drdy_rising_count = 0
-        self._drdy_falling_count = 0
-        self._drdy_schedule_drop_count = 0
+        # DRDY counters: irq, rising, falling, schedule drops
+        self._drdy_counters = array('I', [0, 0, 0, 0])
+        self._drdy_mask = 0
 
         if micropython:
             try:
@@ -74,27 +128,56 @@ class NAU7802:
 
     # ---------- Low-level register helpers (sync, fast) ----------
     def reg_write(self, reg, data):
-        self.i2c.writeto_mem(self.addr, reg, bytes([data]))
+        self._reg_buf[0] = data
+        self.i2c.writeto_mem(self.addr, reg, self._reg_buf)
+        if reg in self._SHADOWED_REGS:
+            self._shadow[reg] = data
 
     def reg_read(self, reg, nbytes=1):
         if nbytes < 1:
             return bytearray()
         return self.i2c.readfrom_mem(self.addr, reg, nbytes)
 
+    def _reg_read_into(self, reg):
+        self.i2c.readfrom_mem_into(self.addr, reg, self._reg_buf)
+        return self._reg_buf[0]
+
+    def _cfg_read(self, reg):
+        value = self._shadow.get(reg)
+        if value is None:
+            value = self._reg_read_into(reg)
+            if reg in self._SHADOWED_REGS:
+                self._shadow[reg] = value
+        return value
+
     def set_bit(self, bit_number, register_address):
-        value = self.reg_read(register_address, 1)[0]
+        value = self._cfg_read(register_address)
         value |= (1 << bit_number)
         self.reg_write(register_address, value)
 
     def clear_bit(self, bit_number, register_address):
-        value = self.reg_read(register_address, 1)[0]
+        value = self._cfg_read(register_address)
         value &= ~(1 << bit_number)
         self.reg_write(register_address, value)
 
     def get_bit(self, bit_number, register_address):
-        value = self.reg_read(register_address, 1)[0]
+        value = self._reg_read_into(register_address)
         return bool(value & (1 << bit_number))
 
+    async def _wait_until(self, pred, timeout_ms, initial_poll_ms=1, max_poll_ms=32):
+        # Poll pred() until it is true or timeout_ms passes. The first re-checks
+        # come quickly; the sleep then doubles up to max_poll_ms for a slow chip.
+        begin = ticks_ms()
+        poll_ms = initial_poll_ms
+        while True:
+            if pred():
+                return True
+            remaining = timeout_ms - ticks_diff(ticks_ms(), begin)
+            if remaining < 0:
+                return False
+            await _sleep_ms(min(poll_ms, remaining + 1))
+            poll_ms = min(poll_ms * 2, max_poll_ms)
+
     # ---------- Device setup ----------
     async def initialize(self, startup_timeout_ms=500):
         self.init_ok = False
@@ -130,55 +213,52 @@ class NAU7802:
         return True
 
     async def wait_for_device_ready(self, timeout_ms=300, poll_ms=10):
-        begin = ticks_ms()
-        while ticks_diff(ticks_ms(), begin) <= timeout_ms:
+        def responds():
             try:
-                self.reg_read(self.PU_CTRL, 1)
+                self._reg_read_into(self.PU_CTRL)
                 return True
             except OSError:
-                await _sleep_ms(poll_ms)
-        return False
+                return False
+
+        return await self._wait_until(responds, timeout_ms, poll_ms)
 
     def reset(self):
         self.set_bit(self.PU_CTRL_RR, self.PU_CTRL)
         self.clear_bit(self.PU_CTRL_RR, self.PU_CTRL)
+        self._shadow = {}  # Every register is back at its power-on default
 
     async def power_up_async(self, timeout_ms=200, poll_ms=2):
         self.set_bit(self.PU_CTRL_PUD, self.PU_CTRL)
         self.set_bit(self.PU_CTRL_PUA, self.PU_CTRL)
 
-        begin = ticks_ms()
-        while ticks_diff(ticks_ms(), begin) <= timeout_ms:
-            if self.get_bit(self.PU_CTRL_PUR, self.PU_CTRL):
-                return True
-            await _sleep_ms(poll_ms)
-        return False
+        return await self._wait_until(
+            lambda: self.get_bit(self.PU_CTRL_PUR, self.PU_CTRL), timeout_ms, poll_ms)
 
     def set_ldo_3v3(self):
-        value = self.reg_read(self.CTRL1, 1)[0]
+        value = self._cfg_read(self.CTRL1)
         value &= 0b11000111
         value |= 0b00100000
         self.reg_write(self.CTRL1, value)
         self.set_bit(self.NAU7802_PU_CTRL_AVDDS, self.PU_CTRL)
 
     def set_gain_128(self):
-        value = self.reg_read(self.CTRL1, 1)[0]
+        value = self._cfg_read(self.CTRL1)
         value &= 0b11111000
         value |= 0b00000111
         self.reg_write(self.CTRL1, value)
 
     def set_sample_rate_80sps(self):
-        value = self.reg_read(self.CTRL2, 1)[0]
+        value = self._cfg_read(self.CTRL2)
         value &= 0b10001111
         value |= 0b00110000
         self.reg_write(self.CTRL2, value)
 
     def set_adc_register(self):
-        value = self.reg_read(self.PGA, 1)[0]
+        value = self._cfg_read(self.PGA)
         value &= 0b01111111
         self.reg_write(self.PGA, value)
 
-        value = self.reg_read(self.ADC, 1)[0]
+        value = self._cfg_read(self.ADC)
         value &= 0b11001111
         value |= 0b00110000
         self.reg_write(self.ADC, value)
@@ -196,29 +276,38 @@ class NAU7802:
 
     async def calibrate_afe_async(self, timeout_ms=1000, poll_ms=2):
         self.begin_calibrate_afe()
-        begin = ticks_ms()
 
-        while ticks_diff(ticks_ms(), begin) <= timeout_ms:
-            state = self.cal_afe_status()
-            if state == self.CAL_SUCCESS:
-                return True
-            if state == self.CAL_FAILURE:
-                return False
-            await _sleep_ms(poll_ms)
-
-        return False
+        settled = await self._wait_until(
+            lambda: self.cal_afe_status() != self.CAL_IN_PROGRESS, timeout_ms, poll_ms)
+        return settled and self.cal_afe_status() == self.CAL_SUCCESS
 
     # ---------- Data path ----------
     def available(self):
         return self.get_bit(self.PU_CTRL_CR, self.PU_CTRL)
 
+    def _drdy_ready(self):
+        # DRDY wired and the scheduler can time out a wait on its flag
+        return self._drdy_pin is not None and hasattr(asyncio, "wait_for_ms")
+
     async def wait_available(self, timeout_ms=200, poll_ms=1):
-        begin = ticks_ms()
-        while ticks_diff(ticks_ms(), begin) <= timeout_ms:
-            if self.available():
-                return True
-            await _sleep_ms(poll_ms)
-        return False
+        if not self._drdy_ready():
+            return await self._wait_until(self.available, timeout_ms, poll_ms)
+
+        # DRDY stays high until the data is read, so a conversion already
+        # waiting shows on the pin; otherwise one deadline-bound wait on the
+        # IRQ flag, cleared first and re-checked against a racing edge
+        drdy_pin = self._drdy_pin
+        if drdy_pin.value():
+            return True
+        flag = self._drdy_flag
+        flag.clear()
+        if drdy_pin.value():
+            return True
+        try:
+            await asyncio.wait_for_ms(flag.wait(), timeout_ms)
+            return True
+        except asyncio.TimeoutError:
+            return False
 
     # ---------- DRDY interrupt path ----------
     def _drdy_signal(self, _arg):
@@ -229,15 +318,13 @@ class NAU7802:
         except Exception:
             pass
 
-    def _drdy_irq_handler(self, _pin):
-        self._drdy_irq_count += 1
-        try:
-            if _pin.value():
-                self._drdy_rising_count += 1
-            else:
-                self._drdy_falling_count += 1
-        except Exception:
-            pass
+    def _drdy_irq_handler(self, pin):
+        mask = self._drdy_mask
+        if mask:
+            level = 1 if mem32[_SIO_GPIO_IN] & mask else 0
+        else:
+            level = pin.value()
+        _drdy_count(self._drdy_counters, level)
 
         if self._drdy_flag is None:
             return
@@ -247,20 +334,22 @@ class NAU7802:
                 micropython.schedule(self._drdy_signal, 0)
                 return
             except Exception:
-                self._drdy_schedule_drop_count += 1
+                self._drdy_counters[3] += 1
 
         self._drdy_signal(0)
 
     def setup_drdy_interrupt(self, pin_num, pull_up=True, trigger=DRDY_TRIGGER_RISING, hard=False, prime_on_high=False):
         self.clear_drdy_interrupt()
 
+        # The DRDY waits treat a high pin as data ready, so program the
+        # conversion-ready polarity to active-high (CTRL1.CRP = 0)
+        self.clear_bit(self.CTRL1_CRP, self.CTRL1)
+
         pull_mode = Pin.PULL_UP if pull_up else None
         self._drdy_pin = Pin(pin_num, Pin.IN, pull_mode)
+        self._drdy_mask = (1 << pin_num) if (_RP2 and 0 <= pin_num < 30) else 0
         self._drdy_flag = asyncio.ThreadSafeFlag()
-        self._drdy_irq_count = 0
-        self._drdy_rising_count = 0
-        self._drdy_falling_count = 0
-        self._drdy_schedule_drop_count = 0
+        self._reset_drdy_counters()
 
         try:
             self._drdy_pin.irq(trigger=trigger, handler=self._drdy_irq_handler, hard=hard)
@@ -296,13 +385,18 @@ class NAU7802:
 
     def drdy_stats(self):
         return {
-            "irq_count": self._drdy_irq_count,
-            "rising_count": self._drdy_rising_count,
-            "falling_count": self._drdy_falling_count,
-            "schedule_drops": self._drdy_schedule_drop_count,
+            "irq_count": self._drdy_counters[0],
+            "rising_count": self._drdy_counters[1],
+            "falling_count": self._drdy_counters[2],
+            "schedule_drops": self._drdy_counters[3],
             "pin_state": self._drdy_pin.value() if self._drdy_pin else None,
         }
 
+    def _reset_drdy_counters(self):
+        c = self._drdy_counters
+        for i in range(4):
+            c[i] = 0
+
     def clear_drdy_interrupt(self):
         if self._drdy_pin:
             try:
@@ -311,13 +405,12 @@ class NAU7802:
                 pass
         self._drdy_pin = None
         self._drdy_flag = None
-        self._drdy_irq_count = 0
-        self._drdy_rising_count = 0
-        self._drdy_falling_count = 0
-        self._drdy_schedule_drop_count = 0
+        self._reset_drdy_counters()
 
+    @micropython.native
     def get_reading(self):
-        raw_data = self.reg_read(self.ADCO_B2, 3)
+        self.i2c.readfrom_mem_into(self.addr, self.ADCO_B2, self._adc_buf)
+        raw_data = self._adc_buf
         value = (raw_data[0] << 16) | (raw_data[1] << 8) | raw_data[2]
         if value > ((1 << 23) - 1):
             value -= (1 << 24)
@@ -329,27 +422,50 @@ class NAU7802:
 
         i = 0
         begin = ticks_ms()
+        data = self.data_arr_i
+        read = self.get_reading
+        if self._drdy_ready():
+            # DRDY wired: the pin level says a conversion is waiting, so each
+            # sample is the one 3-byte ADCO read, with no I2C poll of
+            # PU_CTRL.CR, and between samples we sleep on the IRQ flag
+            drdy_pin = self._drdy_pin
+            while i < times:
+                if drdy_pin.value():
+                    data[i] = read()
+                    i += 1
+                    continue
+
+                remaining = timeout_ms - ticks_diff(ticks_ms(), begin)
+                if remaining < 0 or not await self.wait_available(remaining):
+                    return None
+
         while i < times:
             if ticks_diff(ticks_ms(), begin) > timeout_ms:
                 return None
 
             if self.available():
-                self.data_arr_i[i] = self.get_reading()
+                data[i] = read()
                 i += 1
             else:
                 await _sleep_ms(poll_ms)
 
-        new_arr = self.data_arr_i[0:times]
-        sorted_arr = sorted(new_arr)
-
         remove_each = 5 if times >= 20 else 0
         if (remove_each * 2) >= times:
             remove_each = 0
 
-        if remove_each:
-            sorted_arr = sorted_arr[remove_each:times - remove_each]
-
-        return sum(sorted_arr) / len(sorted_arr)
+        return self._trimmed_mean(data, times, remove_each)
+
+    @micropython.native
+    def _trimmed_mean(self, arr, n, k):
+        # Mean of arr[:n] without its k smallest and k largest samples: the
+        # total less those extremes, found in one pass without sorting
+        total = sum(memoryview(arr)[:n])
+        if k:
+            if len(self._trim_buf) < 2 * k:
+                self._trim_buf = array('i', [0] * (2 * k))
+            _find_extremes(arr, n, self._trim_buf, k)
+            total -= sum(memoryview(self._trim_buf)[:2 * k])
+        return total / (n - 2 * k)
 
     async def tare(self, times=200, timeout_ms=5000):
         reading = await self.get_reading_adv(times=times, timeout_ms=timeout_ms)
@@ -1,16 +1,49 @@
 from machine import Pin
 import uasyncio as asyncio
+import rp2
 import time
 
 CLOCKWISE = 1
 COUNTERCLOCKWISE = -1
 STEPPER_ENABLE_IS_ACTIVE_LOW = True
 DIR_SETUP_MS = 5
+PIO_FREQ = 1000000  # State machine clock; one PIO cycle per microsecond
+
+# Pulses the step pin without the CPU. Takes two words from the TX FIFO:
+# steps - 1, then the half-period in cycles - 4. Each half-period is the set,
+# the mov and y + 1 jmp cycles, padded to y + 4 on both halves. Pushes one
+# word to the RX FIFO when the move is done; with noblock, completions nobody
+# reads (queue_steps moves) are dropped once the FIFO is full, never stalling.
+@rp2.asm_pio(set_init=rp2.PIO.OUT_LOW)
+def _step_pio():
+    pull(block)
+    mov(x, osr)
+    pull(block)
+    mov(isr, osr)
+    label("step")
+    set(pins, 1)   [1]
+    mov(y, isr)
+    label("high")
+    jmp(y_dec, "high")
+    set(pins, 0)
+    mov(y, isr)
+    label("low")
+    jmp(y_dec, "low")
+    jmp(x_dec, "step")
+    push(noblock)
 
 class NEMA17Stepper:
-    def __init__(self, dir_pin, step_pin, en_pin):
+    # sm_id picks the PIO state machine (0-7). Re-creating a stepper on the
+    # same id just reconfigures it, so re-running from the REPL is safe; a
+    # second stepper driven at the same time must pass its own id.
+    def __init__(self, dir_pin, step_pin, en_pin, sm_id=0):
         self.dir = Pin(dir_pin, Pin.OUT)
+        # The state machine owns the step pin from here on; pulse it through
+        # step_motor or queue_steps, not self.step.value()
         self.step = Pin(step_pin, Pin.OUT)
+        self._sm = rp2.StateMachine(sm_id, _step_pio, freq=PIO_FREQ, set_base=self.step)
+        self._sm.active(1)
+        self._queued_until_us = time.ticks_us()  # When the queue_steps moves end
         self.en = Pin(en_pin, Pin.OUT)
         self._enabled = False
         self._dir_needs_settle = True
@@ -48,7 +81,7 @@ class NEMA17Stepper:
         if steps <= 0:
             return
 
-        self.step.value(0)
+        await self.wait_queued()
 
         if self._dir_needs_settle:
             await asyncio.sleep_ms(DIR_SETUP_MS)
@@ -56,14 +89,62 @@ class NEMA17Stepper:
 
         half_pulse_delay_us = max(100, int(delay_ms * 500))
 
-        for step_index in range(steps):
-            self.step.value(1)
-            time.sleep_us(half_pulse_delay_us)
-            self.step.value(0)
-            time.sleep_us(half_pulse_delay_us)
-
-            if (step_index & 0x1F) == 0x1F:
-                await asyncio.sleep_ms(0)
+        # Hand the whole move to the state machine, sleep through most of it,
+        # then poll for its completion word
+        sm = self._sm
+        while sm.rx_fifo():
+            sm.get()  # Completions left by earlier queue_steps moves
+        sm.put(steps - 1)
+        sm.put(half_pulse_delay_us - 4)
+        try:
+            await asyncio.sleep_ms((steps * half_pulse_delay_us) // 500)
+            while not sm.rx_fifo():
+                await asyncio.sleep_ms(1)
+            sm.get()
+        except asyncio.CancelledError:
+            # Abandon the move: back to the top of the program, step pin low
+            sm.restart()
+            sm.exec("set(pins, 0)")
+            while sm.rx_fifo():
+                sm.get()
+            raise
+
+    def queue_steps(self, steps, delay_ms):
+        """
+        Queue a move on the state machine and return at once, without waiting
+        for it or for the direction to settle. Safe from a soft IRQ handler.
+        Returns False, queueing nothing, if the TX FIFO has no room for it.
+        step_motor waits for queued moves to finish before starting its own.
+        """
+        if steps <= 0:
+            return True
+        sm = self._sm
+        if sm.tx_fifo() > 2:
+            return False
+        half_pulse_delay_us = max(100, int(delay_ms * 500))
+        sm.put(steps - 1)
+        sm.put(half_pulse_delay_us - 4)
+
+        # Moves run back to back, so this one ends its length after the later
+        # of now and the end of the last queued one
+        now_us = time.ticks_us()
+        start_us = self._queued_until_us
+        if time.ticks_diff(start_us, now_us) < 0:
+            start_us = now_us
+        self._queued_until_us = time.ticks_add(start_us, steps * 2 * half_pulse_delay_us)
+        return True
+
+    def deinit(self):
+        # Stop the state machine, abandoning any queued moves, step pin low
+        self._sm.active(0)
+        self._sm.exec("set(pins, 0)")
+        self._queued_until_us = time.ticks_us()
+
+    async def wait_queued(self):
+        # Sleep until every move handed over by queue_steps has been stepped
+        remaining_us = time.ticks_diff(self._queued_until_us, time.ticks_us())
+        if remaining_us > 0:
+            await asyncio.sleep_ms(remaining_us // 1000 + 1)
 
 async def test_nema17_stepper():
     # Define pin numbers for stepper motor control
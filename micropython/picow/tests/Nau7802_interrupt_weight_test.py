@@ -1,14 +1,15 @@
 from nau7802_async import NAU7802, _sleep_ms
-from machine import Pin, SoftI2C
+from machine import Pin, I2C
 import uasyncio as asyncio
 
 # Update these pins to your wiring
 SCL_PIN = 13
 SDA_PIN = 12
+I2C_ID = 0  # Hardware I2C0: GP12 (SDA) and GP13 (SCL) are one of its RP2040 pin pairs
 DRDY_PIN = 11  # NAU7802 DRDY pin wired to this GPIO (validated by DRDY pin test)
 ONBOARD_LED_PIN = 25
 
-I2C_FREQ = 100000
+I2C_FREQ = 400000
 READ_SAMPLES = 60
 TARE_SAMPLES = 300
 CAL_SAMPLES = 300
@@ -24,18 +25,22 @@ I2C_ERROR_BACKOFF_MS = 20
 MAX_CONSECUTIVE_I2C_ERRORS = 30
 STARTUP_OP_RETRIES = 3
 
+_WEIGHT_FMT = "%.2f g"
+
 
 async def blink_for_duration(led, duration_ms, on_ms=120, off_ms=120):
-    elapsed = 0
-    while elapsed < duration_ms:
+    # Whole on/off cycles first, then at most one partial on-phase for the rest
+    period = on_ms + off_ms
+    n = duration_ms // period
+    for _ in range(n):
         led.value(1)
         await _sleep_ms(on_ms)
-        elapsed += on_ms
-        if elapsed >= duration_ms:
-            break
         led.value(0)
         await _sleep_ms(off_ms)
-        elapsed += off_ms
+    rem = duration_ms - n * period
+    if rem > 0:
+        led.value(1)
+        await _sleep_ms(min(rem, on_ms))
     led.value(0)
 
 
@@ -48,7 +53,7 @@ async def blink_count(led, count, on_ms=100, off_ms=100):
 
 
 async def main():
-    i2c = SoftI2C(scl=Pin(SCL_PIN), sda=Pin(SDA_PIN), freq=I2C_FREQ)
+    i2c = I2C(I2C_ID, scl=Pin(SCL_PIN), sda=Pin(SDA_PIN), freq=I2C_FREQ)
     led = Pin(ONBOARD_LED_PIN, Pin.OUT)
     led.value(0)
     scale = NAU7802(i2c=i2c)
@@ -125,7 +130,7 @@ async def main():
 
         print("Listening for weight changes via DRDY interrupt...")
         print("Threshold: +/- {:.2f} g".format(CHANGE_THRESHOLD_G))
-        print("DRDY pin {} initial state: {}".format(DRDY_PIN, scale.drdy_stats()["pin_state"]))
+        print("DRDY pin %d initial state: %s" % (DRDY_PIN, scale.drdy_stats()["pin_state"]))
         led.value(1)
         total_i2c_errors = 0
         consecutive_i2c_errors = 0
@@ -161,7 +166,7 @@ async def main():
                 continue
 
             if last_reported is None or abs(weight - last_reported) >= CHANGE_THRESHOLD_G:
-                print("{:.2f} g".format(weight))
+                print(_WEIGHT_FMT % weight)
                 last_reported = weight
     except KeyboardInterrupt:
         print("Stopping measurement (KeyboardInterrupt).")
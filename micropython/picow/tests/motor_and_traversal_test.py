@@ -3,7 +3,8 @@ Combined motor + traversal guide test.
 
 - Runs brushed motor at target encoder speed (cycles/min).
 - Counts encoder slots from IR sensor.
-- Moves traversal NEMA17 stepper 10 steps for every encoder slot.
+- Moves traversal NEMA17 stepper 10 steps for every encoder slot; the encoder
+  IRQ queues each move straight onto the stepper's PIO state machine.
 - Uses inside/outside traversal IR sensors to reverse direction at limits.
 """
 
@@ -66,7 +67,7 @@ async def motor_and_traversal_test():
     encoder_pin = Pin(IR_SENSOR_ENCODER_PIN, Pin.IN, Pin.PULL_UP)
 
     encoder_slot_count = 0
-    traversal_slots_processed = 0
+    traversal_slots_processed = 0  # Slots whose move the PIO accepted
     stepper_steps_moved = 0
     last_encoder_edge_ms = time.ticks_ms()
     encoder_in_gap = (encoder_pin.value() == ENCODER_ACTIVE_LEVEL)
@@ -83,6 +84,7 @@ async def motor_and_traversal_test():
 
     def encoder_irq(pin):
         nonlocal encoder_slot_count, last_encoder_edge_ms, encoder_in_gap, stop_requested
+        nonlocal traversal_slots_processed, stepper_steps_moved
 
         now_ms = time.ticks_ms()
         if time.ticks_diff(now_ms, last_encoder_edge_ms) < ENCODER_DEBOUNCE_MS:
@@ -94,6 +96,9 @@ async def motor_and_traversal_test():
             if not encoder_in_gap:
                 encoder_in_gap = True
                 encoder_slot_count += 1
+                if running and stepper.queue_steps(STEPS_PER_ENCODER_SLOT, STEPPER_DELAY_MS):
+                    traversal_slots_processed += 1
+                    stepper_steps_moved += STEPS_PER_ENCODER_SLOT
                 if encoder_slot_count >= TARGET_ENCODER_SLOTS:
                     stop_requested = True
         else:
@@ -108,28 +113,20 @@ async def motor_and_traversal_test():
                 print(f"Revolutions: {last_reported_revs}")
             await asyncio.sleep_ms(5)
 
-    async def drive_traversal_from_encoder():
-        nonlocal traversal_slots_processed, stepper_steps_moved
-
+    async def watch_traversal_limits():
+        # Steps are generated by the PIO; this only reverses at the limit sensors
         while running:
-            pending_slots = encoder_slot_count - traversal_slots_processed
-            if pending_slots <= 0:
-                await asyncio.sleep_ms(2)
-                continue
-
             inside_triggered = ir_sensor_inside.value() == 0
             outside_triggered = ir_sensor_outside.value() == 0
 
             if inside_triggered and not outside_triggered:
-                stepper.direction = CLOCKWISE
+                if stepper.direction != CLOCKWISE:
+                    stepper.direction = CLOCKWISE
             elif outside_triggered and not inside_triggered:
-                stepper.direction = COUNTERCLOCKWISE
+                if stepper.direction != COUNTERCLOCKWISE:
+                    stepper.direction = COUNTERCLOCKWISE
 
-            stepper.enabled = True
-            await stepper.step_motor(STEPS_PER_ENCODER_SLOT, STEPPER_DELAY_MS)
-            stepper.enabled = False
-            traversal_slots_processed += 1
-            stepper_steps_moved += STEPS_PER_ENCODER_SLOT
+            await asyncio.sleep_ms(2)
 
     async def run_motor_speed_profile():
         nonlocal running
@@ -172,11 +169,14 @@ async def motor_and_traversal_test():
         running = False
         print("Target encoder rotations reached, motor stopping.")
 
+    # Held enabled for the whole run, since moves start from the IRQ
+    stepper.enabled = True
+
     irq_trigger = Pin.IRQ_FALLING | Pin.IRQ_RISING
     encoder_pin.irq(trigger=irq_trigger, handler=encoder_irq)
 
     rev_task = asyncio.create_task(report_revolutions())
-    traversal_task = asyncio.create_task(drive_traversal_from_encoder())
+    traversal_task = asyncio.create_task(watch_traversal_limits())
 
     try:
         await run_motor_speed_profile()
@@ -199,7 +199,10 @@ async def motor_and_traversal_test():
 
         motor_pwm.duty_u16(MAX_DUTY)
         motor_pwm.deinit()
+        # Let the moves already on the PIO finish
+        await stepper.wait_queued()
         stepper.enabled = False
+        stepper.deinit()
 
         expected_steps = encoder_slot_count * STEPS_PER_ENCODER_SLOT
         step_difference = expected_steps - stepper_steps_moved
@@ -7,6 +7,7 @@ PWM frequency set to 60Hz.
 from machine import Pin, PWM
 import uasyncio as asyncio
 import time
+from array import array
 
 # Configuration
 BJT_GATE_PIN = 4  # GPIO pin connected to BJT gate (adjust as needed)
@@ -28,38 +29,50 @@ async def ramp_motor():
     motor_pwm = PWM(Pin(BJT_GATE_PIN))
     motor_pwm.freq(PWM_FREQUENCY)
 
+    # Inverted duty for every whole percent, computed once for both ramps
+    duty_table = array('H', [MAX_DUTY - (pct * MAX_DUTY) // 100 for pct in range(101)])
+
     # Initialize encoder sensor pin
     encoder_pin = Pin(IR_SENSOR_ENCODER_PIN, Pin.IN, Pin.PULL_UP)
-    encoder_count = 0
-    last_encoder_edge_ms = time.ticks_ms()
-    encoder_in_gap = (encoder_pin.value() == ENCODER_ACTIVE_LEVEL)
+    # IRQ state lives in preallocated buffers and is mutated in place, so the
+    # handler never allocates and can run as a hard IRQ.
+    # encoder_state = [slot count, last edge ms]; encoder_gap[0] = in a slot gap
+    encoder_state = array('l', [0, time.ticks_ms()])
+    encoder_gap = bytearray(1)
+    encoder_gap[0] = (encoder_pin.value() == ENCODER_ACTIVE_LEVEL)
+    # Whole revolutions counted by the IRQ (its only writer), which wakes the
+    # reporter on each one
+    rev_count = array('l', [0])
+    rev_flag = asyncio.ThreadSafeFlag()
 
     def encoder_irq(pin):
-        nonlocal encoder_count, last_encoder_edge_ms, encoder_in_gap
         now_ms = time.ticks_ms()
-        if time.ticks_diff(now_ms, last_encoder_edge_ms) < ENCODER_DEBOUNCE_MS:
+        if time.ticks_diff(now_ms, encoder_state[1]) < ENCODER_DEBOUNCE_MS:
             return
-        last_encoder_edge_ms = now_ms
+        encoder_state[1] = now_ms
 
         sensor_value = pin.value()
         if sensor_value == ENCODER_ACTIVE_LEVEL:
-            if not encoder_in_gap:
-                encoder_in_gap = True
-                encoder_count += 1
+            if not encoder_gap[0]:
+                encoder_gap[0] = 1
+                encoder_state[0] += 1
+                if encoder_state[0] % ENCODER_SLOTS_PER_REV == 0:
+                    rev_count[0] += 1
+                    rev_flag.set()
         else:
-            encoder_in_gap = False
+            encoder_gap[0] = 0
 
     async def report_encoder_counts():
         last_reported_revs = 0
         while True:
-            revolutions = encoder_count // ENCODER_SLOTS_PER_REV
+            await rev_flag.wait()
+            revolutions = rev_count[0]
             while last_reported_revs < revolutions:
                 last_reported_revs += 1
                 print(f"Revolutions: {last_reported_revs}")
-            await asyncio.sleep_ms(5)
 
     irq_trigger = Pin.IRQ_FALLING | Pin.IRQ_RISING
-    encoder_pin.irq(trigger=irq_trigger, handler=encoder_irq)
+    encoder_pin.irq(trigger=irq_trigger, handler=encoder_irq, hard=True)
     encoder_report_task = asyncio.create_task(report_encoder_counts())
     
     print(f"Starting asynchronous motor ramp test")
@@ -75,8 +88,7 @@ async def ramp_motor():
         
         for duty_pct in range(0, 101, RAMP_STEP):
             # Set PWM
-            duty_value = MAX_DUTY - int((duty_pct / 100) * MAX_DUTY)
-            motor_pwm.duty_u16(duty_value)
+            motor_pwm.duty_u16(duty_table[duty_pct])
             
             # Print progress every 10%
             if duty_pct % 10 == 0:
@@ -95,8 +107,7 @@ async def ramp_motor():
         
         for duty_pct in range(100, -1, -RAMP_STEP):
             # Set PWM
-            duty_value = MAX_DUTY - int((duty_pct / 100) * MAX_DUTY)
-            motor_pwm.duty_u16(duty_value)
+            motor_pwm.duty_u16(duty_table[duty_pct])
             
             # Print progress every 10%
             if duty_pct % 10 == 0:
@@ -121,7 +132,7 @@ async def ramp_motor():
         # Ensure motor is stopped
         motor_pwm.duty_u16(MAX_DUTY)
         motor_pwm.deinit()
-        print(f"Final encoder slot count: {encoder_count}")
+        print(f"Final encoder slot count: {encoder_state[0]}")
         print("Motor stopped and PWM disabled.")
 
 
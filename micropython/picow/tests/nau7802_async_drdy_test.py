@@ -1,17 +1,18 @@
-from machine import Pin, SoftI2C
+from machine import Pin, I2C
 import uasyncio as asyncio
 from time import ticks_ms, ticks_diff
 from nau7802_async import NAU7802, _sleep_ms
 
 SCL_PIN = 13
 SDA_PIN = 12
+I2C_ID = 0  # Hardware I2C0: GP12 (SDA) and GP13 (SCL) are one of its RP2040 pin pairs
 DRDY_PIN = 11
-I2C_FREQ = 100000
+I2C_FREQ = 400000
 TEST_DURATION_MS = 5000
 
 
 async def main():
-    i2c = SoftI2C(scl=Pin(SCL_PIN), sda=Pin(SDA_PIN), freq=I2C_FREQ)
+    i2c = I2C(I2C_ID, scl=Pin(SCL_PIN), sda=Pin(SDA_PIN), freq=I2C_FREQ)
     scale = NAU7802(i2c=i2c)
 
     ok = await scale.initialize()
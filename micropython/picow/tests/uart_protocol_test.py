@@ -0,0 +1,18 @@
+from common.uart_protocol import uartCommand
+
+# Every command the protocol encodes must parse back to itself at the framed length
+COMMANDS = ("00000", "12345", "40999", "97001")
+
+
+def test_encode_roundtrip():
+    cmdlen = uartCommand.commandlen()
+    buf = bytearray(cmdlen)
+    for cmdStr in COMMANDS:
+        cmd = uartCommand(cmdStr)
+        assert uartCommand(cmd.encode().decode()).encode() == cmd.encode()
+        assert cmd.encode_into(buf) == cmdlen and bytes(buf) == cmdStr.encode()
+    print("uartCommand encode round-trip OK")
+
+
+if __name__ == "__main__":
+    test_encode_roundtrip()
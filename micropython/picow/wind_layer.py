@@ -60,7 +60,6 @@ STEPPER_STEP_PIN = 1
 STEPPER_EN_PIN = 2
 CLOCKWISE = 1
 STEPPER_DELAY_MS = 2
-STEPPER_PULSE_WIDTH_US = 300
 STEPPER_MIN_INTERVAL_US = 500
 STEPPER_MAX_INTERVAL_US = 8000
 
@@ -211,9 +210,7 @@ async def wind_first_layer():
         nonlocal traversal_steps_moved
 
         stepper.enabled = True
-        stepper.step.value(0)
         await asyncio.sleep_ms(5)
-        next_step_us = time.ticks_us()
 
         while running or (traversal_steps_moved < first_layer_steps):
             effective_encoder_slots = float(encoder_slot_count)
@@ -246,23 +243,15 @@ async def wind_first_layer():
             elif step_interval_us > STEPPER_MAX_INTERVAL_US:
                 step_interval_us = STEPPER_MAX_INTERVAL_US
 
-            now_us = time.ticks_us()
-            steps_emitted = 0
-            while (step_deficit > 0) and (time.ticks_diff(now_us, next_step_us) >= 0) and (steps_emitted < 4):
-                stepper.step.value(1)
-                time.sleep_us(STEPPER_PULSE_WIDTH_US)
-                stepper.step.value(0)
-
-                traversal_steps_moved += 1
-                step_deficit -= 1
-                steps_emitted += 1
-
-                next_step_us = time.ticks_add(next_step_us, step_interval_us)
-                now_us = time.ticks_us()
-
-            if steps_emitted == 0:
-                await asyncio.sleep_ms(0)
+            # The PIO paces the pulses; hand it a few steps at a time so the
+            # interval keeps following the encoder
+            chunk_steps = min(step_deficit, 4)
+            if stepper.queue_steps(chunk_steps, step_interval_us / 1000):
+                traversal_steps_moved += chunk_steps
+            else:
+                await asyncio.sleep_ms(1)
 
+        await stepper.wait_queued()
         stepper.enabled = False
 
     irq_trigger = Pin.IRQ_FALLING | Pin.IRQ_RISING
@@ -341,6 +330,7 @@ async def wind_first_layer():
         motor_pwm.deinit()
         Pin(BJT_GATE_PIN, Pin.OUT).value(1)
         stepper.enabled = False
+        stepper.deinit()
 
         if traversal_exception is not None:
             raise traversal_exception